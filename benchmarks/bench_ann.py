@@ -0,0 +1,69 @@
+import argparse
+import time
+import faiss
+from vector_data import add_data_arguments, load_data, ground_truth, recall_at_k, timed_search
+
+# Recall vs throughput vs memory for the FAISS_INDEX_TYPE options: exact Flat, IVFFlat over a range of nprobe values,
+# HNSWFlat over a range of efSearch values, and the quantized SQ8 / PQ / IVF-PQ indexes with and without exact
+# re-ranking (FAISS_RERANK). Recall@k is measured against the Flat results; bytes/vec is the serialized size.
+# Run from the repository root: python benchmarks/bench_ann.py [--vectors catalog.npy]
+
+def build(factory, database, train_size):
+    index = faiss.index_factory(database.shape[1], factory)
+    start = time.perf_counter()
+    if not index.is_trained:
+        index.train(database[:min(train_size, len(database))])
+    index.add(database)
+    return index, time.perf_counter() - start
+
+def report(label, index, params, queries, truth, k, build_seconds):
+    found, qps, p50, p99 = timed_search(lambda query, k: index.search(query, k, params=params), queries, k)
+    bytes_per_vector = faiss.serialize_index(index).nbytes / index.ntotal
+    print(f"{label:<26} {recall_at_k(found, truth, k):>9.3f} {qps:>9.0f} {p50:>8.3f} {p99:>8.3f} {build_seconds:>8.1f} "
+          f"{bytes_per_vector:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against exact search")
+    add_data_arguments(parser)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", default="16,64,256")
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ sub-quantizers, must divide the vector width")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="candidates re-scored per result with RFlat")
+    args = parser.parse_args()
+
+    database, queries = load_data(args)
+    truth = ground_truth(database, queries, args.k)
+    print(f"{len(database)} vectors, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<26} {'recall@k':>9} {'qps':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'bytes/vec':>10}")
+
+    index, seconds = build("Flat", database, 0)
+    report("Flat", index, None, queries, truth, args.k, seconds)
+
+    # FAISS_METRIC=ip: on unit vectors inner product ranks like L2, with a cheaper comparison
+    index = faiss.index_factory(database.shape[1], "Flat", faiss.METRIC_INNER_PRODUCT)
+    start = time.perf_counter()
+    index.add(database)
+    report("Flat inner product", index, None, queries, truth, args.k, time.perf_counter() - start)
+
+    index, seconds = build(f"IVF{args.nlist},Flat", database, 40 * args.nlist)
+    for nprobe in (int(value) for value in args.nprobe.split(",")):
+        params = faiss.SearchParametersIVF(nprobe=min(nprobe, args.nlist))
+        report(f"IVF{args.nlist} nprobe={nprobe}", index, params, queries, truth, args.k, seconds)
+
+    index, seconds = build(f"HNSW{args.hnsw_m},Flat", database, 0)
+    for ef_search in (int(value) for value in args.ef_search.split(",")):
+        params = faiss.SearchParametersHNSW(efSearch=max(ef_search, args.k))
+        report(f"HNSW{args.hnsw_m} efSearch={ef_search}", index, params, queries, truth, args.k, seconds)
+
+    train_size = max(10000, 40 * args.nlist)
+    quantized = [("SQ8", "SQ8", None), (f"PQ{args.pq_m}", f"PQ{args.pq_m}", None),
+                 (f"IVF{args.nlist},PQ{args.pq_m}", f"IVF{args.nlist},PQ{args.pq_m}", faiss.SearchParametersIVF(nprobe=16))]
+    for label, factory, base_params in quantized:
+        index, seconds = build(factory, database, train_size)
+        report(label, index, base_params, queries, truth, args.k, seconds)
+        index, seconds = build(factory + ",RFlat", database, train_size)
+        index.k_factor = args.rerank_factor
+        params = faiss.IndexRefineSearchParameters(k_factor=args.rerank_factor, base_index_params=base_params) if base_params else None
+        report(f"{label} +rerank x{args.rerank_factor}", index, params, queries, truth, args.k, seconds)
@@ -0,0 +1,26 @@
+import argparse
+import faiss
+from vector_data import add_data_arguments, load_data, ground_truth, shorten, recall_at_k, timed_search
+
+# Recall vs latency vs memory for shortened embeddings (EMBEDDING_DIMENSIONS).
+# Ground truth is exact search on the full-width vectors; each size is searched with IndexFlatL2 on the
+# leading dimensions renormalized, which is what the embeddings API returns for `dimensions`.
+# Run from the repository root: python benchmarks/bench_dimensions.py [--vectors catalog.npy]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark reduced embedding dimensionality")
+    add_data_arguments(parser)
+    parser.add_argument("--dims", default="256,512,1024,1536")
+    args = parser.parse_args()
+
+    database, queries = load_data(args)
+    truth = ground_truth(database, queries, args.k)
+    print(f"{len(database)} vectors, {len(queries)} queries, k={args.k}")
+    print(f"{'dims':>6} {'recall@k':>9} {'qps':>9} {'p50 ms':>8} {'p99 ms':>8} {'bytes/vec':>10} {'index MiB':>10}")
+    for dim in (int(value) for value in args.dims.split(",")):
+        index = faiss.IndexFlatL2(dim)
+        index.add(shorten(database, dim))
+        found, qps, p50, p99 = timed_search(index.search, shorten(queries, dim), args.k)
+        index_bytes = faiss.serialize_index(index).nbytes
+        print(f"{dim:>6} {recall_at_k(found, truth, args.k):>9.3f} {qps:>9.0f} {p50:>8.3f} {p99:>8.3f} "
+              f"{index_bytes / index.ntotal:>10.0f} {index_bytes / 2**20:>10.1f}")
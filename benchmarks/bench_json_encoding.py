@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+# Micro-benchmark: the old convert_decimal + json.dumps path vs decimal_json.dumps on a 10k-item response.
+# Run from the repository root: python benchmarks/bench_json_encoding.py [items] [repeats]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import decimal_json
+
+# The recursive conversion handler.py used before decimal_json, kept here as the baseline
+def convert_decimal(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    if isinstance(obj, list):
+        return [convert_decimal(i) for i in obj]
+    if isinstance(obj, dict):
+        return {k: convert_decimal(v) for k, v in obj.items()}
+    return obj
+
+def make_items(count):
+    return [
+        {
+            "quote_id": str(i),
+            "quote_text": f"Quote number {i}: keep going, one step at a time, and never stop learning.",
+            "author": f"Author {i % 500}",
+            "author_lc": f"author {i % 500}",
+            "year": Decimal(1900 + i % 120),
+            "category": ["grit", "work"],
+            "image_url": f"https://link_to_image_{i}.jpg"
+        }
+        for i in range(count)
+    ]
+
+def measure(label, encode, payload, repeats):
+    encode(payload)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encode(payload)
+    elapsed = (time.perf_counter() - start) / repeats
+    tracemalloc.start()
+    encode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed * 1000:8.2f} ms/op   peak alloc {peak / 1024:9.1f} KiB")
+    return elapsed, peak
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payload = {"quotes": make_items(count), "next_cursor": None}
+    print(f"{count} items, {repeats} repeats")
+    old_time, old_peak = measure("convert_decimal + json.dumps", lambda p: json.dumps(convert_decimal(p)), payload, repeats)
+    new_time, new_peak = measure("decimal_json.dumps", decimal_json.dumps, payload, repeats)
+    assert json.dumps(convert_decimal(payload)) == decimal_json.dumps(payload)
+    print(f"CPU: {old_time / new_time:.2f}x faster, peak allocation: {old_peak / new_peak:.2f}x smaller")
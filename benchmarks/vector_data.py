@@ -0,0 +1,72 @@
+import time
+import faiss
+import numpy as np
+
+# Shared helpers for the vector benchmarks: test data, ground truth, recall@k and latency percentiles.
+
+FULL_DIM = 1536
+
+# Load an (N x D) float32 matrix saved with np.save, e.g. real embeddings of the catalog
+def load_vectors(path):
+    return np.ascontiguousarray(np.load(path).astype("float32"))
+
+# Synthetic unit vectors whose variance decays across dimensions, so (like text-embedding-3) the leading
+# dimensions carry most of the signal. Real embeddings (--vectors) give more trustworthy numbers.
+def synthetic_vectors(count, dim=FULL_DIM, seed=0):
+    rng = np.random.default_rng(seed)
+    clusters = rng.standard_normal((max(1, count // 50), dim)).astype("float32")
+    vectors = clusters[rng.integers(0, len(clusters), count)] + 0.5 * rng.standard_normal((count, dim)).astype("float32")
+    vectors *= (1.0 / np.sqrt(1.0 + np.arange(dim, dtype="float32") / 32.0))
+    return normalize(vectors)
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.maximum(norms, 1e-12), dtype="float32")
+
+# The shortened text-embedding-3 vectors are the leading dimensions renormalized to unit length
+def shorten(vectors, dim):
+    return normalize(vectors[:, :dim])
+
+# Split data into database vectors and held-out queries
+def split_queries(vectors, query_count, seed=1):
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    return np.ascontiguousarray(vectors[order[query_count:]]), np.ascontiguousarray(vectors[order[:query_count]])
+
+# Exact nearest neighbours by brute force (the recall reference)
+def ground_truth(database, queries, k):
+    index = faiss.IndexFlatL2(database.shape[1])
+    index.add(database)
+    return index.search(queries, k)[1]
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(found_row[:k]) & set(truth_row[:k])) for found_row, truth_row in zip(found, truth))
+    return hits / (len(truth) * k)
+
+# Search one query at a time (as the service does) and return (ids, qps, p50 ms, p99 ms).
+# search(query, k) returns FAISS's (distances, ids) pair.
+def timed_search(search, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query.reshape(1, -1), k)[1][0])
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    return (
+        np.array(results),
+        len(queries) / latencies.sum(),
+        float(np.percentile(latencies, 50) * 1000),
+        float(np.percentile(latencies, 99) * 1000)
+    )
+
+# Parse benchmark data options shared by the scripts
+def add_data_arguments(parser):
+    parser.add_argument("--vectors", default=None, help=".npy file of full-width embeddings (default: synthetic)")
+    parser.add_argument("--count", type=int, default=20000, help="synthetic vector count")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+
+def load_data(args):
+    vectors = load_vectors(args.vectors) if args.vectors else synthetic_vectors(args.count)
+    return split_queries(vectors, args.queries)
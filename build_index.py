@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import faiss
+import numpy as np
+from boto3.dynamodb.types import TypeDeserializer # type: ignore
+from openai import OpenAI
+from tqdm import tqdm
+from embeddings import EMBEDDING_DIMENSIONS, embedding_batches, embed_texts
+from quote_files import iter_quotes
+from catalog_scan import parallel_scan
+from faiss_service.index_types import (INDEX_TYPE, INDEX_TYPES, NLIST, HNSW_M, PQ_M, RERANK, METRIC, METRICS,
+                                       make_index, training_size, bytes_per_vector, is_inner_product)
+
+# Offline FAISS index builder: embeds a quote catalog in large batches and writes the index file plus an
+# id map (quote_ids in index order) that faiss_service/app.py loads at startup.
+# Sources: quotes.json-style JSON arrays or NDJSON, DynamoDB "Export to S3" files (DynamoDB JSON, .json.gz),
+# or the live table with --from-table.
+
+DIM = EMBEDDING_DIMENSIONS
+BATCH_SIZE = 1000  # the embeddings API accepts up to 2048 inputs per call
+BATCH_MAX_TOKENS = 250000
+
+deserializer = TypeDeserializer()
+
+# Helper function to unwrap DynamoDB export records ({"Item": {"quote_id": {"S": ...}}}) into plain quotes
+def plain_quote(record):
+    if "Item" in record and isinstance(record["Item"], dict):
+        return {key: deserializer.deserialize(value) for key, value in record["Item"].items()}
+    return record
+
+# Helper function to read quotes from every source path, skipping ones without text
+def iter_source_quotes(paths):
+    for path in paths:
+        for record in iter_quotes(path):
+            quote = plain_quote(record)
+            if quote.get("quote_id") and quote.get("quote_text"):
+                yield quote
+
+# Helper function to write the id map next to the index
+def write_id_map(path, ids):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(ids, file)
+
+# Helper function to train the index on the held-back vectors (if it still needs it) and then add them
+def train_and_add(index, held):
+    sample = np.vstack(held)
+    if not index.is_trained:
+        minimum = training_size(index)[1]
+        if len(sample) < minimum:
+            raise ValueError(f"{len(sample)} vectors cannot train this index (needs at least {minimum}), "
+                             "lower --nlist or use another --index-type")
+        tqdm.write(f"Training on {len(sample)} vectors")
+        index.train(sample)
+    index.add(sample)
+
+# Function to embed quotes batch by batch into an index from make_index, returning the matching id list.
+# Index types that need training (IVF, SQ8, PQ) hold back the first train_size vectors as the training sample.
+def build_index(quotes, client, index, batch_size=BATCH_SIZE, max_tokens=BATCH_MAX_TOKENS, train_size=None):
+    train_size = train_size or training_size(index)[0]
+    ids = []
+    held = []
+    held_count = 0
+    progress = tqdm(unit="quotes", dynamic_ncols=True)
+    for batch in embedding_batches(quotes, lambda quote: quote["quote_text"], batch_size, max_tokens):
+        vectors = np.asarray(embed_texts(client, [quote["quote_text"] for quote in batch]), dtype="float32")
+        if is_inner_product(index):
+            # The service normalizes the same way on insert and query
+            faiss.normalize_L2(vectors)
+        ids.extend(str(quote["quote_id"]) for quote in batch)
+        if index.is_trained:
+            index.add(vectors)
+        else:
+            held.append(vectors)
+            held_count += len(vectors)
+            if held_count >= train_size:
+                train_and_add(index, held)
+                held = []
+        progress.update(len(batch))
+    if held:
+        train_and_add(index, held)
+    progress.close()
+    return ids
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed a quote catalog and write a FAISS index plus id map")
+    parser.add_argument("sources", nargs="*", default=["quotes.json"],
+                        help="JSON array, NDJSON or DynamoDB export files (.gz allowed)")
+    parser.add_argument("--from-table", action="store_true", help="read the live MotivationalQuotes table instead")
+    parser.add_argument("--segments", type=int, default=None, help="parallel scan segments for --from-table")
+    parser.add_argument("--output", default="quotes.index", help="FAISS index file to write")
+    parser.add_argument("--ids", default=None, help="id map file to write (default: <output>.ids.json)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-tokens", type=int, default=BATCH_MAX_TOKENS)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE, help="default: FAISS_INDEX_TYPE or flat")
+    parser.add_argument("--nlist", type=int, default=NLIST, help="IVF lists (FAISS_NLIST)")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M, help="HNSW links per node (FAISS_HNSW_M)")
+    parser.add_argument("--metric", choices=sorted(METRICS), default=METRIC,
+                        help="l2 distance or ip (cosine on normalized vectors) (FAISS_METRIC)")
+    parser.add_argument("--pq-m", type=int, default=PQ_M, help="PQ sub-quantizers, must divide the width (FAISS_PQ_M)")
+    parser.add_argument("--rerank", action="store_true", default=RERANK,
+                        help="keep float32 vectors to re-rank quantized results exactly (FAISS_RERANK)")
+    parser.add_argument("--train-size", type=int, default=None,
+                        help="training sample for ivf/sq8/pq/ivfpq (default: max(10000, 40 x nlist))")
+    args = parser.parse_args()
+    if args.from_table:
+        quotes = (quote for quote in parallel_scan("MotivationalQuotes", args.segments) if quote.get("quote_text"))
+    else:
+        quotes = iter_source_quotes(args.sources)
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    index = make_index(args.index_type, DIM, args.nlist, args.hnsw_m, args.pq_m, args.rerank, args.metric)
+    ids = build_index(quotes, client, index, args.batch_size, args.max_tokens, args.train_size)
+    faiss.write_index(index, args.output)
+    write_id_map(args.ids or args.output + ".ids.json", ids)
+    print(f"Wrote {index.ntotal} vectors to {args.output} (~{bytes_per_vector(index)} bytes per vector)")
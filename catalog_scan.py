@@ -0,0 +1,49 @@
+import boto3 # type: ignore
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import decimal_json
+
+# Parallel segmented scan for full-catalog reads (exports, index rebuilds).
+# Each segment runs on its own thread with its own boto3 session, because boto3 resources are not thread safe.
+REGION = "us-east-1"
+DEFAULT_SEGMENTS = int(os.getenv("CATALOG_SCAN_SEGMENTS", "4"))
+
+# Helper function to read every item in one segment, following LastEvaluatedKey
+def scan_segment(table_name, segment, total_segments, scan_kwargs):
+    segment_table = boto3.session.Session().resource("dynamodb", region_name=REGION).Table(table_name)
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    items = []
+    while True:
+        response = segment_table.scan(**kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Function to scan a whole table with Segment/TotalSegments over a thread pool and merge the results
+def parallel_scan(table_name, total_segments=None, max_workers=None, **scan_kwargs):
+    total_segments = total_segments or DEFAULT_SEGMENTS
+    max_workers = max_workers or total_segments
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(scan_segment, table_name, segment, total_segments, scan_kwargs)
+            for segment in range(total_segments)
+        ]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+    return items
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a DynamoDB table to a JSON file with a parallel scan")
+    parser.add_argument("output", help="JSON file to write")
+    parser.add_argument("--table", default="MotivationalQuotes")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="TotalSegments for the scan")
+    parser.add_argument("--workers", type=int, default=None, help="threads (defaults to --segments)")
+    args = parser.parse_args()
+    items = parallel_scan(args.table, args.segments, args.workers)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(items, file, indent=4, cls=decimal_json.DecimalEncoder)
+    print(f"Exported {len(items)} items from {args.table} to {args.output}")
@@ -0,0 +1,15 @@
+import json
+from decimal import Decimal
+
+# JSON encoding for DynamoDB items: boto3 returns numbers as Decimal, which json.dumps rejects.
+# Decimals are converted while the encoder walks the structure, so responses are not copied first.
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj % 1 == 0 else float(obj)  # Convert to int if whole number, else float
+        return super().default(obj)
+
+# Helper function to serialize a response body that may contain Decimals
+def dumps(obj, **kwargs):
+    return json.dumps(obj, cls=DecimalEncoder, **kwargs)
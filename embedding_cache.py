@@ -0,0 +1,193 @@
+import boto3 # type: ignore
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+# Content-addressed embedding cache shared by the write and search paths.
+# Keys are (model, dimensions, sha256 of the normalized text); an in-process LRU sits in front of a
+# persistent tier, which is the EMBEDDING_CACHE_TABLE DynamoDB table or, locally, the EMBEDDING_CACHE_PATH SQLite file.
+# Both tiers hold packed float32 bytes (6 KiB per 1536-dim vector, against ~48 KiB as a list of Python floats);
+# vectors are unpacked only when they are returned.
+
+MEMORY_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+BATCH_GET_SIZE = 100
+# Retries for unprocessed keys/items (throttling), same backoff as handler.hydrate_quotes
+TIER_MAX_RETRIES = 5
+TIER_BASE_DELAY = 0.05
+
+memory = OrderedDict()
+lock = threading.Lock()
+counters = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+persistent_tiers = {}
+
+# Helper function to normalize text before hashing and embedding (Unicode NFC, collapsed whitespace)
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+# Helper function to build the cache key for a text
+def cache_key(model, dimensions, text):
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 'native'}:{digest}"
+
+# Helper functions to store vectors as little-endian float32 bytes
+def pack_vector(vector):
+    values = array("f", vector)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def unpack_vector(data):
+    values = array("f")
+    values.frombytes(bytes(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+# Helper function to wait before a retry: exponential backoff with jitter
+def backoff(attempt):
+    time.sleep(TIER_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+
+class DynamoTier:
+    # Uses the low-level client, which (unlike resources) is safe to share between pipeline threads
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.client = boto3.client("dynamodb", region_name="us-east-1")
+
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            request_items = {
+                self.table_name: {"Keys": [{"cache_key": {"S": key}} for key in keys[start:start + BATCH_GET_SIZE]]}
+            }
+            attempt = 0
+            while request_items:
+                response = self.client.batch_get_item(RequestItems=request_items)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    found[item["cache_key"]["S"]] = bytes(item["vector"]["B"])
+                request_items = response.get("UnprocessedKeys")
+                if request_items:
+                    # Keys still unprocessed after the retries count as misses
+                    if attempt >= TIER_MAX_RETRIES:
+                        break
+                    backoff(attempt)
+                    attempt += 1
+        return found
+
+    def put_many(self, entries):
+        items = [
+            {"PutRequest": {"Item": {"cache_key": {"S": key}, "vector": {"B": packed}}}}
+            for key, packed in entries.items()
+        ]
+        for start in range(0, len(items), 25):
+            request_items = {self.table_name: items[start:start + 25]}
+            attempt = 0
+            while request_items:
+                response = self.client.batch_write_item(RequestItems=request_items)
+                request_items = response.get("UnprocessedItems")
+                if request_items:
+                    # The cache is an optimization: give up on items still unprocessed after the retries
+                    if attempt >= TIER_MAX_RETRIES:
+                        break
+                    backoff(attempt)
+                    attempt += 1
+
+class SqliteTier:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (cache_key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.db.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), BATCH_GET_SIZE):
+                chunk = keys[start:start + BATCH_GET_SIZE]
+                rows = self.db.execute(
+                    f"SELECT cache_key, vector FROM embeddings WHERE cache_key IN ({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                found.update((key, bytes(packed)) for key, packed in rows)
+        return found
+
+    def put_many(self, entries):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (cache_key, vector) VALUES (?, ?)",
+                list(entries.items())
+            )
+            self.db.commit()
+
+# Helper function to get the configured persistent tier, or None when only the in-process LRU is used
+def get_persistent_tier():
+    table_name = os.getenv("EMBEDDING_CACHE_TABLE")
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    key = table_name or path
+    if not key:
+        return None
+    if key not in persistent_tiers:
+        persistent_tiers[key] = DynamoTier(table_name) if table_name else SqliteTier(path)
+    return persistent_tiers[key]
+
+# Helper function to add packed vectors to the in-process LRU
+def remember(entries):
+    with lock:
+        for key, packed in entries.items():
+            memory[key] = packed
+            memory.move_to_end(key)
+        while len(memory) > MEMORY_MAX_ENTRIES:
+            memory.popitem(last=False)
+
+# Function to look up cached vectors, returning {key: vector} for the keys that were found
+def get_many(keys):
+    found = {}
+    with lock:
+        for key in keys:
+            if key in memory:
+                memory.move_to_end(key)
+                found[key] = memory[key]
+        counters["memory_hits"] += len(found)
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    tier = get_persistent_tier()
+    if missing and tier:
+        # A failing persistent tier must not fail the request; its keys count as misses
+        try:
+            stored = tier.get_many(missing)
+        except Exception as e:
+            print(f"Embedding cache read failed: {e}")
+            stored = {}
+        remember(stored)
+        found.update(stored)
+        with lock:
+            counters["persistent_hits"] += len(stored)
+    with lock:
+        counters["misses"] += len([key for key in missing if key not in found])
+    return {key: unpack_vector(packed) for key, packed in found.items()}
+
+# Function to store freshly computed vectors in both tiers
+def put_many(entries):
+    if not entries:
+        return
+    packed = {key: pack_vector(vector) for key, vector in entries.items()}
+    remember(packed)
+    tier = get_persistent_tier()
+    if tier:
+        # The vectors are already paid for; a failed cache write is skipped rather than failing the caller
+        try:
+            tier.put_many(packed)
+        except Exception as e:
+            print(f"Embedding cache write failed: {e}")
+
+# Function to report hit/miss counters for this container
+def stats():
+    with lock:
+        result = dict(counters, memory_entries=len(memory))
+    lookups = result["memory_hits"] + result["persistent_hits"] + result["misses"]
+    result["hit_rate"] = round((result["memory_hits"] + result["persistent_hits"]) / lookups, 4) if lookups else None
+    return result
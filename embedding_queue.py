@@ -0,0 +1,96 @@
+import boto3 # type: ignore
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Queue of pending embedding jobs for asynchronous POST /quotes ingestion.
+# Production uses SQS (EMBEDDING_QUEUE_URL); without it jobs go to a local SQLite file
+# (EMBEDDING_QUEUE_PATH, ":memory:" for a purely in-process queue) so the flow can be run and tested locally.
+
+SQS_BATCH_SIZE = 10  # SendMessageBatch / ReceiveMessage / DeleteMessageBatch limit
+VISIBILITY_TIMEOUT = int(os.getenv("EMBEDDING_QUEUE_VISIBILITY_TIMEOUT", "300"))
+
+class SqsQueue:
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+        self.sqs = boto3.client("sqs", region_name="us-east-1")
+
+    def send(self, jobs):
+        for start in range(0, len(jobs), SQS_BATCH_SIZE):
+            entries = [
+                {"Id": str(i), "MessageBody": json.dumps(job)}
+                for i, job in enumerate(jobs[start:start + SQS_BATCH_SIZE])
+            ]
+            response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            if response.get("Failed"):
+                raise Exception(f"Failed to enqueue {len(response['Failed'])} embedding jobs")
+
+    def receive(self, max_messages):
+        messages = []
+        while len(messages) < max_messages:
+            response = self.sqs.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(SQS_BATCH_SIZE, max_messages - len(messages)),
+                VisibilityTimeout=VISIBILITY_TIMEOUT
+            )
+            batch = response.get("Messages", [])
+            if not batch:
+                break
+            messages.extend((message["ReceiptHandle"], json.loads(message["Body"])) for message in batch)
+        return messages
+
+    def delete(self, receipts):
+        for start in range(0, len(receipts), SQS_BATCH_SIZE):
+            entries = [
+                {"Id": str(i), "ReceiptHandle": receipt}
+                for i, receipt in enumerate(receipts[start:start + SQS_BATCH_SIZE])
+            ]
+            self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+
+class SqliteQueue:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL, visible_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def send(self, jobs):
+        with self.lock:
+            self.db.executemany(
+                "INSERT INTO jobs (body, visible_at) VALUES (?, ?)",
+                [(json.dumps(job), time.time()) for job in jobs]
+            )
+            self.db.commit()
+
+    def receive(self, max_messages):
+        # Claimed jobs stay hidden for VISIBILITY_TIMEOUT and reappear if they are never deleted, like SQS
+        with self.lock:
+            now = time.time()
+            rows = self.db.execute(
+                "SELECT id, body FROM jobs WHERE visible_at <= ? ORDER BY id LIMIT ?", (now, max_messages)
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE jobs SET visible_at = ? WHERE id = ?",
+                [(now + VISIBILITY_TIMEOUT, job_id) for job_id, _ in rows]
+            )
+            self.db.commit()
+        return [(job_id, json.loads(body)) for job_id, body in rows]
+
+    def delete(self, receipts):
+        with self.lock:
+            self.db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in receipts])
+            self.db.commit()
+
+queues = {}
+
+# Function to get the configured embedding job queue (one instance per container)
+def get_embedding_queue():
+    queue_url = os.getenv("EMBEDDING_QUEUE_URL")
+    key = queue_url or os.getenv("EMBEDDING_QUEUE_PATH", "embedding_jobs.sqlite3")
+    if key not in queues:
+        queues[key] = SqsQueue(queue_url) if queue_url else SqliteQueue(key)
+    return queues[key]
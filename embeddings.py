@@ -0,0 +1,52 @@
+import os
+import embedding_cache
+
+# Embedding model, request batching and the cached embed call shared by handler.py and the offline tools.
+
+# EMBEDDING_DIMENSIONS must match the FAISS service, which reads the same variable; text-embedding-3 models
+# return shortened (still unit-length) vectors for 256/512/1024 at lower memory and search cost
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "50000"))
+
+# Helper function to estimate the token count of a text (about 4 characters per token for English)
+def estimate_tokens(text):
+    return len(str(text)) // 4 + 1
+
+# Helper function to group entries into embedding batches bounded by item count and token budget
+def embedding_batches(entries, text_of, max_items=None, max_tokens=None):
+    max_items = max_items or EMBED_BATCH_SIZE
+    max_tokens = max_tokens or EMBED_BATCH_MAX_TOKENS
+    batch = []
+    batch_tokens = 0
+    for entry in entries:
+        tokens = estimate_tokens(text_of(entry))
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(entry)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+# Function to embed a list of texts with an OpenAI client, returning vectors in input order
+# Texts already in embedding_cache are not sent; the rest go to OpenAI in one call and are cached
+def embed_texts(client, texts):
+    texts = [embedding_cache.normalize_text(text) for text in texts]
+    keys = [embedding_cache.cache_key(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text) for text in texts]
+    vectors = embedding_cache.get_many(keys)
+    missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in vectors))
+    if missing:
+        embedding_response = client.embeddings.create(
+            input=missing,
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS
+        )
+        fresh = {}
+        for data in embedding_response.data:
+            fresh[embedding_cache.cache_key(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, missing[data.index])] = data.embedding
+        embedding_cache.put_many(fresh)
+        vectors.update(fresh)
+    return [vectors[key] for key in keys]
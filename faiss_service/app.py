@@ -1,37 +1,291 @@
 from flask import Flask, request, jsonify
 import numpy as np
 import faiss
+import io
+import json
+import os
 import threading
+import time
+from index_types import INDEX_TYPE, make_index, search_parameters, supports_compaction, bytes_per_vector, is_inner_product
+from wal import OP_ADD, OP_DELETE, WriteAheadLog, encode_record, list_segments, replay
 
 app = Flask(__name__)
 
-# In-memory FAISS index (L2 distance, 1536 dims for OpenAI embeddings)
-DIM = 1536
-index = faiss.IndexFlatL2(DIM)
-quote_ids = []  # List to map index positions to quote_ids
+# In-memory FAISS index (type and metric chosen by FAISS_INDEX_TYPE / FAISS_METRIC, see index_types.py); EMBEDDING_DIMENSIONS must match the Lambda setting (1536 is the full
+# text-embedding-3-small width, 256/512/1024 are the shortened sizes)
+DIM = int(os.getenv('EMBEDDING_DIMENSIONS', '1536'))
+# Index file and id map written by build_index.py, loaded at startup when there is no snapshot yet
+INDEX_PATH = os.getenv('FAISS_INDEX_PATH', 'quotes.index')
+IDS_PATH = os.getenv('FAISS_IDS_PATH', INDEX_PATH + '.ids.json')
+# Snapshots: index-<millis>.faiss + index-<millis>.ids.json, with LATEST naming the newest complete pair.
+# They are written every FAISS_SNAPSHOT_INTERVAL seconds when the index changed (0 disables) and on POST /snapshot.
+SNAPSHOT_DIR = os.getenv('FAISS_SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_INTERVAL = int(os.getenv('FAISS_SNAPSHOT_INTERVAL', '300'))
+SNAPSHOTS_KEPT = 2
+LATEST_PATH = os.path.join(SNAPSHOT_DIR, 'LATEST')
+# Memory-map the index file instead of reading it into RAM, where the index type supports it; a mapped index
+# is meant for read-mostly replicas
+USE_MMAP = os.getenv('FAISS_MMAP', 'false').lower() == 'true'
+# Write-ahead log of adds/deletes since the last snapshot, replayed on startup and truncated by each snapshot
+WAL_ENABLED = os.getenv('FAISS_WAL', 'true').lower() == 'true'
+WAL_DIR = os.getenv('FAISS_WAL_DIR', SNAPSHOT_DIR)
+
+def load_index_files(index_path, ids_path):
+    loaded = None
+    if USE_MMAP:
+        try:
+            loaded = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            app.logger.warning('%s cannot be memory-mapped, reading it into memory', index_path)
+    if loaded is None:
+        loaded = faiss.read_index(index_path)
+    with open(ids_path, 'r', encoding='utf-8') as file:
+        ids = json.load(file)
+    if loaded.d != DIM or loaded.ntotal != len(ids):
+        raise ValueError(f'{index_path} ({loaded.ntotal} x {loaded.d}) does not match {ids_path} ({len(ids)} ids) and DIM {DIM}')
+    return loaded, ids
+
+def snapshot_paths(name):
+    base = os.path.join(SNAPSHOT_DIR, name)
+    return base + '.faiss', base + '.ids.json'
+
+def now_millis():
+    return int(time.time() * 1000)
+
+# Returns (index, quote_ids, snapshot key); WAL segments from the snapshot key on are replayed on top
+def load_index():
+    if os.path.exists(LATEST_PATH):
+        with open(LATEST_PATH, 'r', encoding='utf-8') as file:
+            name = file.read().strip()
+        return (*load_index_files(*snapshot_paths(name)), int(name[len('index-'):]))
+    if os.path.exists(INDEX_PATH) and os.path.exists(IDS_PATH):
+        return (*load_index_files(INDEX_PATH, IDS_PATH), 0)
+    empty = make_index(INDEX_TYPE, DIM)
+    if not empty.is_trained:
+        # IVF and quantized indexes cannot take vectors before they are trained; build_index.py trains one from the catalog
+        app.logger.warning('No trained %s index found, starting with a flat index', INDEX_TYPE)
+        empty = make_index('flat', DIM)
+    return empty, [], 0
+
+# Remove every vector stored for a quote_id (call with the lock held). Flat indexes compact in order on remove_ids,
+# so deleting the same positions from quote_ids keeps the two aligned; other types leave a None tombstone.
+def remove_quote(quote_id):
+    global tombstones
+    positions = [position for position, stored_id in enumerate(quote_ids) if stored_id == quote_id]
+    if positions and supports_compaction(index):
+        index.remove_ids(np.array(positions, dtype='int64'))
+        quote_ids[:] = [stored_id for stored_id in quote_ids if stored_id != quote_id]
+    else:
+        for position in positions:
+            quote_ids[position] = None
+        tombstones += len(positions)
+    return len(positions)
+
+def add_vectors(ids, vectors):
+    index.add(vectors)
+    quote_ids.extend(ids)
+
+index, quote_ids, snapshot_key = load_index()  # quote_ids maps index positions to quote_ids
+tombstones = quote_ids.count(None)
+# The loaded index decides the metric, so a prebuilt inner-product index is normalized for even if FAISS_METRIC is unset
+COSINE = is_inner_product(index)
+METRIC_NAME = 'inner_product' if COSINE else 'l2'
 lock = threading.Lock()
+snapshot_lock = threading.Lock()  # one snapshot writer at a time
+changes_since_snapshot = replay(WAL_DIR, snapshot_key, DIM, add_vectors, remove_quote) if WAL_ENABLED else 0
+wal = None
+if WAL_ENABLED:
+    # New mutations go to a fresh segment, keyed after every existing one
+    wal = WriteAheadLog(WAL_DIR, max([now_millis()] + [key + 1 for key in list_segments(WAL_DIR)]))
+
+# Log records under the index lock (so the log order matches the index), then wait for the fsync outside it
+def log_mutation(records):
+    return wal.append(records) if wal else None
+
+def sync_log(sequence):
+    if wal and sequence:
+        wal.sync(sequence)
+
+# Write bytes to a temporary file, fsync it and rename it into place, so readers never see a partial file
+def write_file_atomic(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def prune_snapshots():
+    names = sorted(name[:-len('.faiss')] for name in os.listdir(SNAPSHOT_DIR)
+                   if name.startswith('index-') and name.endswith('.faiss'))
+    for name in names[:-SNAPSHOTS_KEPT]:
+        for path in snapshot_paths(name):
+            if os.path.exists(path):
+                os.remove(path)
+
+def take_snapshot():
+    global changes_since_snapshot
+    with snapshot_lock:
+        # Serialize under the lock (a memory copy), write to disk outside it so adds and searches keep going
+        # The WAL switches to a new segment at the same instant, so the snapshot covers exactly the older segments
+        with lock:
+            data = faiss.serialize_index(index)
+            ids = list(quote_ids)
+            captured_changes = changes_since_snapshot
+            key = wal.rotate(now_millis()) if wal else now_millis()
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        name = f'index-{key:015d}'
+        index_path, ids_path = snapshot_paths(name)
+        write_file_atomic(index_path, data.tobytes())
+        write_file_atomic(ids_path, json.dumps(ids).encode('utf-8'))
+        write_file_atomic(LATEST_PATH, name.encode('utf-8'))
+        with lock:
+            changes_since_snapshot -= captured_changes
+        if wal:
+            wal.truncate_before(key)
+        prune_snapshots()
+    return {'snapshot': name, 'vectors': len(ids)}
+
+def snapshot_loop():
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        if changes_since_snapshot:
+            try:
+                take_snapshot()
+            except Exception:
+                app.logger.exception('Periodic FAISS snapshot failed')
+
+if SNAPSHOT_INTERVAL > 0:
+    threading.Thread(target=snapshot_loop, daemon=True).start()
+
+NPY_MAGIC = b'\x93NUMPY'
+
+# Inner-product indexes hold unit vectors, so every inserted and query vector is L2-normalized (on a copy: binary
+# request bodies are read-only views). WAL records are written after this, so replay needs no normalization.
+def prepare_vectors(vectors):
+    if not COSINE:
+        return vectors
+    vectors = np.array(vectors, dtype='float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+# Read the query/insert vector from the request body: application/octet-stream carries raw little-endian
+# float32 (viewed with np.frombuffer, no copy) or a .npy file, with the other fields in the query string;
+# JSON bodies ({"embedding": [...], ...}) are still accepted. Returns (1 x D vector, params).
+def read_vector():
+    if request.mimetype == 'application/octet-stream':
+        body = request.get_data()
+        if body[:len(NPY_MAGIC)] == NPY_MAGIC:
+            vector = np.load(io.BytesIO(body), allow_pickle=False).astype('<f4', copy=False)
+        else:
+            vector = np.frombuffer(body, dtype='<f4')
+        return vector.reshape(1, -1), request.args
+    data = request.json
+    return np.array(data['embedding'], dtype='float32').reshape(1, -1), data
+
+# Bulk form of read_vector: a multipart body with a JSON 'quote_ids' field and an 'embeddings' part holding the
+# N rows as raw little-endian float32 (or a .npy matrix), or a JSON body. Returns (ids, N x ? matrix).
+def read_vectors():
+    if request.mimetype == 'multipart/form-data':
+        ids = json.loads(request.form['quote_ids'])
+        body = request.files['embeddings'].read()
+        if body[:len(NPY_MAGIC)] == NPY_MAGIC:
+            return ids, np.load(io.BytesIO(body), allow_pickle=False).astype('<f4', copy=False)
+        embeddings = np.frombuffer(body, dtype='<f4')
+        if ids and embeddings.size % len(ids) == 0:
+            embeddings = embeddings.reshape(len(ids), -1)
+        return ids, embeddings
+    data = request.json
+    return data['quote_ids'], np.asarray(data['embeddings'], dtype='float32')
 
 @app.route('/add_embedding', methods=['POST'])
 def add_embedding():
-    data = request.json
-    embedding = np.array(data['embedding'], dtype='float32').reshape(1, -1)
+    global changes_since_snapshot
+    embedding, data = read_vector()
+    if embedding.shape[1] != DIM:
+        return jsonify({'error': f'embedding must have {DIM} dimensions'}), 400
     quote_id = data['quote_id']
+    embedding = prepare_vectors(embedding)
     with lock:
+        sequence = log_mutation([encode_record(OP_ADD, quote_id, embedding)])
         index.add(embedding)
         quote_ids.append(quote_id)
+        changes_since_snapshot += 1
+    sync_log(sequence)
     return jsonify({'status': 'success'})
 
+@app.route('/add_embeddings', methods=['POST'])
+def add_embeddings():
+    # Bulk insert: N quote_ids plus an N x DIM matrix, added with one index.add under one lock
+    global changes_since_snapshot
+    ids, embeddings = read_vectors()
+    if embeddings.ndim != 2 or embeddings.shape[1] != DIM:
+        return jsonify({'error': f'embeddings must be an N x {DIM} matrix'}), 400
+    if embeddings.shape[0] != len(ids):
+        return jsonify({'error': 'quote_ids and embeddings must have the same length'}), 400
+    embeddings = prepare_vectors(embeddings)
+    with lock:
+        sequence = log_mutation([encode_record(OP_ADD, quote_id, vector) for quote_id, vector in zip(ids, embeddings)])
+        index.add(np.ascontiguousarray(embeddings))
+        quote_ids.extend(ids)
+        changes_since_snapshot += len(ids)
+    sync_log(sequence)
+    return jsonify({'status': 'success', 'added': len(ids)})
+
+@app.route('/delete_embedding', methods=['POST'])
+def delete_embedding():
+    global changes_since_snapshot
+    quote_id = request.json['quote_id']
+    with lock:
+        sequence = log_mutation([encode_record(OP_DELETE, quote_id)])
+        removed = remove_quote(quote_id)
+        changes_since_snapshot += 1
+    sync_log(sequence)
+    return jsonify({'status': 'success', 'removed': removed})
+
 @app.route('/search', methods=['POST'])
 def search():
-    data = request.json
-    embedding = np.array(data['embedding'], dtype='float32').reshape(1, -1)
+    embedding, data = read_vector()
+    if embedding.shape[1] != DIM:
+        return jsonify({'error': f'embedding must have {DIM} dimensions'}), 400
     top_k = int(data.get('top_k', 5))
+    # nprobe (IVF) and efSearch (HNSW) trade recall for latency per request
+    params = search_parameters(index, top_k, data.get('nprobe'), data.get('efSearch'))
+    embedding = prepare_vectors(embedding)
     with lock:
         if index.ntotal == 0:
-            return jsonify({'results': []})
-        D, I = index.search(embedding, top_k)
-        results = [quote_ids[i] for i in I[0] if i < len(quote_ids)]
-    return jsonify({'results': results})
+            return jsonify({'results': [], 'scores': [], 'metric': METRIC_NAME})
+        # Over-fetch when deleted vectors may take some of the top slots
+        D, I = index.search(embedding, top_k + min(tombstones, top_k), params=params)
+        hits = [(quote_ids[i], float(score)) for score, i in zip(D[0], I[0])
+                if 0 <= i < len(quote_ids) and quote_ids[i] is not None][:top_k]
+    # scores line up with results: cosine similarity for inner_product, squared distance for l2
+    return jsonify({
+        'results': [quote_id for quote_id, _ in hits],
+        'scores': [score for _, score in hits],
+        'metric': METRIC_NAME
+    })
+
+# Index size report: bytes per vector are approximate (codes, labels, graph links, re-ranking copy)
+@app.route('/stats', methods=['GET'])
+def stats():
+    with lock:
+        per_vector = bytes_per_vector(index)
+        result = {
+            'index': type(faiss.downcast_index(index)).__name__,
+            'dimensions': DIM,
+            'metric': METRIC_NAME,
+            'vectors': index.ntotal,
+            'deleted': tombstones,
+            'bytes_per_vector': per_vector,
+            'float32_bytes_per_vector': 4 * DIM,
+            'estimated_index_bytes': per_vector * index.ntotal
+        }
+    return jsonify(result)
+
+@app.route('/snapshot', methods=['POST'])
+def snapshot():
+    return jsonify(take_snapshot())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import faiss
+
+# Index types selectable with FAISS_INDEX_TYPE, shared by the service and build_index.py:
+#   flat - exact brute force (IndexFlatL2)
+#   ivf  - IVFFlat: vectors bucketed into FAISS_NLIST k-means cells, FAISS_NPROBE cells scanned per query; needs training
+#   hnsw - HNSWFlat: graph with FAISS_HNSW_M links per node, FAISS_EF_SEARCH candidates explored per query
+#   sq8  - 8-bit scalar quantizer: 1 byte per dimension instead of 4; needs training (per-dimension ranges)
+#   pq   - product quantizer: FAISS_PQ_M one-byte codes per vector; needs training
+#   ivfpq - IVF lists over PQ codes, for large catalogs; needs training
+# FAISS_METRIC=ip switches any type to inner product; the service L2-normalizes vectors on insert and query, so
+# scores are cosine similarities (higher is closer). The default l2 returns squared distances (lower is closer).
+# FAISS_RERANK=true keeps the full float32 vectors next to a quantized index and re-scores the top
+# FAISS_RERANK_FACTOR x k candidates exactly (recall back near flat, memory back up by 4 bytes per dimension).
+INDEX_TYPE = os.getenv('FAISS_INDEX_TYPE', 'flat').lower()
+NLIST = int(os.getenv('FAISS_NLIST', '1024'))
+NPROBE = int(os.getenv('FAISS_NPROBE', '16'))
+HNSW_M = int(os.getenv('FAISS_HNSW_M', '32'))
+EF_CONSTRUCTION = int(os.getenv('FAISS_EF_CONSTRUCTION', '64'))
+EF_SEARCH = int(os.getenv('FAISS_EF_SEARCH', '64'))
+PQ_M = int(os.getenv('FAISS_PQ_M', '64'))  # must divide the embedding width
+RERANK = os.getenv('FAISS_RERANK', 'false').lower() == 'true'
+RERANK_FACTOR = int(os.getenv('FAISS_RERANK_FACTOR', '4'))
+METRIC = os.getenv('FAISS_METRIC', 'l2').lower()
+METRICS = {'l2': faiss.METRIC_L2, 'ip': faiss.METRIC_INNER_PRODUCT}
+INDEX_TYPES = ('flat', 'ivf', 'hnsw', 'sq8', 'pq', 'ivfpq')
+QUANTIZED_TYPES = ('sq8', 'pq', 'ivfpq')
+PQ_CENTROIDS = 256  # 8-bit PQ codes
+
+def factory_string(kind, nlist=NLIST, hnsw_m=HNSW_M, pq_m=PQ_M, rerank=RERANK):
+    if kind == 'flat':
+        return 'Flat'
+    if kind == 'ivf':
+        return f'IVF{nlist},Flat'
+    if kind == 'hnsw':
+        return f'HNSW{hnsw_m},Flat'
+    if kind not in QUANTIZED_TYPES:
+        raise ValueError(f'unknown index type {kind!r}, expected one of {", ".join(INDEX_TYPES)}')
+    codes = {'sq8': 'SQ8', 'pq': f'PQ{pq_m}', 'ivfpq': f'IVF{nlist},PQ{pq_m}'}[kind]
+    return codes + ',RFlat' if rerank else codes
+
+def make_index(kind, dim, nlist=NLIST, hnsw_m=HNSW_M, pq_m=PQ_M, rerank=RERANK, metric=METRIC):
+    if metric not in METRICS:
+        raise ValueError(f'unknown metric {metric!r}, expected l2 or ip')
+    index = faiss.index_factory(dim, factory_string(kind, nlist, hnsw_m, pq_m, rerank), METRICS[metric])
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = RERANK_FACTOR
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = NPROBE
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efConstruction = EF_CONSTRUCTION
+        base.hnsw.efSearch = EF_SEARCH
+    return index
+
+# The approximate index inside a re-ranking wrapper (or the index itself)
+def base_index(index):
+    index = faiss.downcast_index(index)
+    return faiss.downcast_index(index.base_index) if isinstance(index, faiss.IndexRefine) else index
+
+# Training sample sizes: (recommended, minimum). IVF wants about 40 vectors per list and at least one per list;
+# PQ runs k-means with 256 centroids per sub-quantizer; SQ8 only learns per-dimension ranges.
+def training_size(index):
+    base = base_index(index)
+    if base.is_trained:
+        return 0, 0
+    recommended, minimum = 10000, 1
+    if isinstance(base, faiss.IndexIVF):
+        recommended, minimum = max(recommended, 40 * base.nlist), base.nlist
+    if isinstance(base, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        recommended, minimum = max(recommended, 40 * PQ_CENTROIDS), max(minimum, PQ_CENTROIDS)
+    return recommended, minimum
+
+# Approximate resident bytes per stored vector: codes, stored labels (IVF), graph links (HNSW) and the float
+# copy kept for re-ranking. Fixed tables (centroids, codebooks) are not included.
+def bytes_per_vector(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return bytes_per_vector(index.base_index) + bytes_per_vector(index.refine_index)
+    if isinstance(index, faiss.IndexIVF):
+        return index.code_size + 8
+    if isinstance(index, faiss.IndexHNSW):
+        return bytes_per_vector(index.storage) + 4 * index.hnsw.nb_neighbors(0)
+    if isinstance(index, faiss.IndexFlatCodes):
+        return index.code_size
+    return 4 * index.d
+
+# Per-request search parameters (thread safe, unlike setting index.nprobe), or None for exact indexes
+def search_parameters(index, top_k, nprobe=None, ef_search=None):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        base_params = search_parameters(index.base_index, top_k, nprobe, ef_search)
+        if base_params is None:
+            return None
+        return faiss.IndexRefineSearchParameters(k_factor=index.k_factor, base_index_params=base_params)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=min(int(nprobe or index.nprobe), index.nlist))
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=max(int(ef_search or index.hnsw.efSearch), top_k))
+    return None
+
+def is_inner_product(index):
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+# Flat code indexes renumber the remaining vectors on remove_ids; IVF keeps the old labels and HNSW cannot
+# remove at all, so those need tombstones in the id map instead
+def supports_compaction(index):
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
@@ -0,0 +1,141 @@
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+# Append-only write-ahead log for index mutations.
+# The log is a series of segments, wal-<key>.log. A snapshot named index-<key> covers every segment with a smaller key,
+# so startup replays the segments whose key is >= the latest snapshot's key.
+# Record: op (1 byte), id length (uint16), crc32 of the payload (uint32), then the payload: the utf-8 id and,
+# for adds, the little-endian float32 vector.
+
+OP_ADD = 1
+OP_DELETE = 2
+HEADER = struct.Struct('<BHI')
+
+def segment_path(directory, key):
+    return os.path.join(directory, f'wal-{key:015d}.log')
+
+def list_segments(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[4:-4]) for name in os.listdir(directory) if name.startswith('wal-') and name.endswith('.log'))
+
+def encode_record(op, quote_id, vector=None):
+    payload = str(quote_id).encode('utf-8')
+    id_length = len(payload)
+    if vector is not None:
+        payload += np.ascontiguousarray(vector, dtype='<f4').tobytes()
+    return HEADER.pack(op, id_length, zlib.crc32(payload)) + payload
+
+# Yield (op, quote_id, vector or None) from one segment. A torn or corrupt record (a crash mid-write) ends the
+# segment: everything after it was never acknowledged.
+def read_segment(path, dim):
+    with open(path, 'rb') as file:
+        data = file.read()
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        op, id_length, crc = HEADER.unpack_from(data, pos)
+        size = id_length + (dim * 4 if op == OP_ADD else 0)
+        payload = data[pos + HEADER.size:pos + HEADER.size + size]
+        if op not in (OP_ADD, OP_DELETE) or len(payload) != size or zlib.crc32(payload) != crc:
+            break
+        quote_id = payload[:id_length].decode('utf-8')
+        vector = np.frombuffer(payload[id_length:], dtype='<f4').reshape(1, dim) if op == OP_ADD else None
+        yield op, quote_id, vector
+        pos += HEADER.size + size
+
+# Apply the segments at or after snapshot_key in order: consecutive adds go to add_batch(ids, N x dim matrix)
+# in one call, deletes to delete(quote_id). Returns the number of records replayed.
+def replay(directory, snapshot_key, dim, add_batch, delete):
+    replayed = 0
+    for key in list_segments(directory):
+        if key < snapshot_key:
+            continue
+        pending_ids, pending_vectors = [], []
+        for op, quote_id, vector in read_segment(segment_path(directory, key), dim):
+            replayed += 1
+            if op == OP_ADD:
+                pending_ids.append(quote_id)
+                pending_vectors.append(vector)
+                continue
+            # Apply the adds logged before this delete first
+            if pending_ids:
+                add_batch(pending_ids, np.ascontiguousarray(np.vstack(pending_vectors)))
+                pending_ids, pending_vectors = [], []
+            delete(quote_id)
+        if pending_ids:
+            add_batch(pending_ids, np.ascontiguousarray(np.vstack(pending_vectors)))
+    return replayed
+
+class WriteAheadLog:
+    # append() is called under the index lock so log order matches index order; sync() is called after the lock
+    # is released and blocks until the record is on disk. Concurrent callers share one fsync (group commit).
+    def __init__(self, directory, key):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.cond = threading.Condition()
+        self.written = 0
+        self.synced = 0
+        self.syncing = False
+        self.key = key
+        self.file = open(segment_path(directory, key), 'ab')
+
+    def append(self, records):
+        with self.cond:
+            for record in records:
+                self.file.write(record)
+            self.written += 1
+            return self.written
+
+    def sync(self, sequence):
+        with self.cond:
+            while self.synced < sequence:
+                if not self.syncing:
+                    break
+                self.cond.wait()
+            else:
+                return
+            self.syncing = True
+            target = self.written
+            self.file.flush()
+            file = self.file
+        done = False
+        try:
+            os.fsync(file.fileno())
+            done = True
+        finally:
+            # A failed fsync leaves the records unsynced; the next caller retries it
+            with self.cond:
+                self.syncing = False
+                if done:
+                    self.synced = max(self.synced, target)
+                self.cond.notify_all()
+
+    # Close the current segment (flushed and fsynced) and start a new one; returns the new segment's key.
+    # Called under the index lock when a snapshot is taken, so the new segment holds exactly the later mutations.
+    def rotate(self, key):
+        with self.cond:
+            while self.syncing:
+                self.cond.wait()
+            key = max(key, self.key + 1)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.synced = self.written
+            self.key = key
+            self.file = open(segment_path(self.directory, key), 'ab')
+            return key
+
+    # Delete the segments a snapshot made redundant
+    def truncate_before(self, key):
+        for old_key in list_segments(self.directory):
+            if old_key < key:
+                os.remove(segment_path(self.directory, old_key))
+
+    def close(self):
+        with self.cond:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
@@ -2,41 +2,378 @@ import json
 import boto3
 import os
 from openai import OpenAI
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
-from decimal import Decimal
+from collections import OrderedDict
 import requests
 import uuid
 import time
+import base64
+import math
+import random
+import queue
+import threading
+import decimal_json
+from embedding_queue import get_embedding_queue
+import embedding_cache
+import embeddings
+from embeddings import embedding_batches
+from quote_index import (
+    AUTHOR_INDEX, normalize_author, add_author_fields, normalize_categories, category_memberships,
+    tokenize, term_postings, CATALOG_VERSION_KEY, bump_catalog_version, write_quotes, borrow_tables
+)
 
 dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
 table = dynamodb.Table("MotivationalQuotes")
+YEAR_INDEX = "YearIndex"
 favorites_table = boto3.resource("dynamodb", region_name="us-east-1").Table("FavoritesTable")
 history_table = boto3.resource("dynamodb", region_name="us-east-1").Table("HistoryTable")
+category_table = dynamodb.Table("QuoteCategories")
+term_table = dynamodb.Table("QuoteTerms")
+meta_table = dynamodb.Table("CatalogMeta")
 
 # OpenAI API Key (store securely in environment variables)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Helper function to convert Decimal to int or float
-def convert_decimal(obj):
-    if isinstance(obj, Decimal):
-        return int(obj) if obj % 1 == 0 else float(obj)  # Convert to int if whole number, else float
-    if isinstance(obj, list):
-        return [convert_decimal(i) for i in obj]  # Convert lists recursively
-    if isinstance(obj, dict):
-        return {k: convert_decimal(v) for k, v in obj.items()}  # Convert dicts recursively
-    return obj
-
-# Function to get all quotes
+# Helper function to embed a list of texts with the shared client (see embeddings.embed_texts)
+def embed_texts(texts):
+    return embeddings.embed_texts(client, texts)
+
+# Helper function to embed a chunk of texts, retrying one text at a time when the chunk call fails (as
+# quote_index.write_in_chunks does for writes) so one bad text only fails itself.
+# Returns [(vector or None, error message or None)] in input order.
+def embed_chunk(texts):
+    try:
+        return [(vector, None) for vector in embed_texts(texts)]
+    except Exception as e:
+        if len(texts) == 1:
+            return [(None, str(e))]
+    results = []
+    for text in texts:
+        try:
+            results.append((embed_texts([text])[0], None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+# Helper function to build a FAISS microservice URL from FAISS_SERVICE_URL (the service base URL)
+def faiss_endpoint(path):
+    return os.getenv("FAISS_SERVICE_URL", "http://localhost:5000").rstrip("/") + path
+
+# Send single vectors to FAISS as raw little-endian float32 (about 6 KB instead of ~30 KB of JSON);
+# set FAISS_BINARY_TRANSPORT=false to fall back to JSON bodies
+FAISS_BINARY_TRANSPORT = os.getenv("FAISS_BINARY_TRANSPORT", "true").lower() == "true"
+
+# Helper function to POST one embedding to a FAISS endpoint, with the other fields as params
+def post_embedding(path, embedding, params):
+    if FAISS_BINARY_TRANSPORT:
+        return requests.post(
+            faiss_endpoint(path),
+            params=params,
+            data=embedding_cache.pack_vector(embedding),
+            headers={"Content-Type": "application/octet-stream"}
+        )
+    return requests.post(faiss_endpoint(path), json=dict(params, embedding=embedding))
+
+# Helper function to POST a batch of embeddings to /add_embeddings: the rows as one float32 part, the ids as JSON
+def post_embeddings(quote_ids, vectors):
+    if FAISS_BINARY_TRANSPORT:
+        return requests.post(
+            faiss_endpoint("/add_embeddings"),
+            data={"quote_ids": json.dumps(quote_ids)},
+            files={"embeddings": ("embeddings", b"".join(embedding_cache.pack_vector(vector) for vector in vectors), "application/octet-stream")}
+        )
+    return requests.post(faiss_endpoint("/add_embeddings"), json={"quote_ids": quote_ids, "embeddings": vectors})
+
+# Minimum cosine similarity for semantic results; weaker matches are dropped before they are hydrated.
+# Only applied when the FAISS service runs with FAISS_METRIC=ip (its L2 scores are distances, not similarities).
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE")) if os.getenv("SEMANTIC_MIN_SCORE") else None
+
+# Helper function to get the ranked quote_ids from a FAISS /search response, applying SEMANTIC_MIN_SCORE
+def search_result_ids(search_response):
+    result_ids = search_response.get("results", [])
+    scores = search_response.get("scores")
+    if SEMANTIC_MIN_SCORE is not None and scores is not None and search_response.get("metric") == "inner_product":
+        result_ids = [quote_id for quote_id, score in zip(result_ids, scores) if score >= SEMANTIC_MIN_SCORE]
+    # A quote indexed twice (e.g. a redelivered embedding job) is returned once, at its best rank
+    return list(dict.fromkeys(result_ids))
+
+# Stage concurrency for the batch ingestion pipeline; keep INGEST_EMBED_WORKERS under the OpenAI rate limit
+INGEST_WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", "2"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_FAISS_WORKERS = int(os.getenv("INGEST_FAISS_WORKERS", "1"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+PIPELINE_DONE = object()
+
+# Function to push batches through stages of (work, workers) connected by bounded queues
+# Each stage's work(batch) returns the batch for the next stage, or None to drop it; stages run concurrently.
+# An exception from work is passed to on_error(position, batch, error) and the worker moves on; an exception
+# from the batches iterator is raised after every stage has shut down.
+def run_pipeline(batches, stages, on_error=None):
+    queues = [queue.Queue(maxsize=INGEST_QUEUE_SIZE) for _ in stages]
+
+    def stage_loop(position, work):
+        while True:
+            batch = queues[position].get()
+            if batch is PIPELINE_DONE:
+                return
+            # A dead worker would leave its queue full and block the shutdown below
+            try:
+                result = work(batch)
+            except Exception as e:
+                if on_error:
+                    on_error(position, batch, str(e))
+                else:
+                    print(f"Pipeline stage {position} failed: {e}")
+                continue
+            if result and position + 1 < len(queues):
+                queues[position + 1].put(result)
+
+    threads = [
+        [threading.Thread(target=stage_loop, args=(position, work), daemon=True) for _ in range(max(1, workers))]
+        for position, (work, workers) in enumerate(stages)
+    ]
+    for stage_threads in threads:
+        for thread in stage_threads:
+            thread.start()
+    try:
+        for batch in batches:
+            queues[0].put(batch)
+    finally:
+        # Shut stages down in order so every batch drains through the later stages
+        for position, stage_threads in enumerate(threads):
+            for _ in stage_threads:
+                queues[position].put(PIPELINE_DONE)
+            for thread in stage_threads:
+                thread.join()
+
+# Page size bounds for paginated list endpoints
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+# Helper function to read query string parameters (API Gateway sends None when there are none)
+def get_query_params(event):
+    return event.get("queryStringParameters") or {}
+
+# Helper function to parse the ?limit= parameter, clamped to MAX_PAGE_LIMIT
+def parse_limit(params):
+    limit = params.get("limit")
+    if limit is None or limit == "":
+        return DEFAULT_PAGE_LIMIT
+    if not str(limit).isdigit() or int(limit) < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(int(limit), MAX_PAGE_LIMIT)
+
+# Helper function to turn a DynamoDB LastEvaluatedKey into an opaque cursor string
+def encode_cursor(last_key):
+    if not last_key:
+        return None
+    raw = decimal_json.dumps(last_key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+# Helper function to turn a cursor back into an ExclusiveStartKey
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("cursor is invalid")
+    if not isinstance(start_key, dict):
+        raise ValueError("cursor is invalid")
+    return start_key
+
+# Quote attributes a client may ask for with ?fields=
+QUOTE_FIELDS = ("quote_id", "quote_text", "author", "year", "category", "image_url")
+
+# Helper function to parse ?fields=a,b into a tuple of attribute names (None means every attribute)
+def parse_fields(params):
+    fields = params.get("fields")
+    if not fields:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    if not names or any(name not in QUOTE_FIELDS for name in names):
+        raise ValueError(f"fields must be a comma separated subset of: {', '.join(QUOTE_FIELDS)}")
+    return names
+
+# Helper function to turn a fields tuple into ProjectionExpression kwargs for scan/query/get/batch-get
+# Every name goes through a placeholder because "year" is a DynamoDB reserved word
+def projection_kwargs(fields):
+    if not fields:
+        return {}
+    names = {f"#f{i}": name for i, name in enumerate(fields)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+# Helper function to drop attributes the client did not ask for
+def trim_fields(items, fields):
+    if not fields:
+        return items
+    return [{name: item[name] for name in fields if name in item} for item in items]
+
+# Per-container read cache: survives warm invocations, keyed by request and dropped whenever the
+# catalog version (bumped by every write path) changes
+CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512"))
+catalog_cache = OrderedDict()
+catalog_cache_version = None
+
+# Helper function to read the current catalog version (one small GetItem)
+def get_catalog_version():
+    response = meta_table.get_item(
+        Key={"meta_key": CATALOG_VERSION_KEY},
+        ProjectionExpression="#v",
+        ExpressionAttributeNames={"#v": "version"}
+    )
+    return int(response.get("Item", {}).get("version", 0))
+
+# Helper function to drop the warm cache if the catalog version moved on (one GetItem per call)
+def sync_catalog_cache():
+    global catalog_cache_version
+    version = get_catalog_version()
+    if version != catalog_cache_version:
+        catalog_cache.clear()
+        catalog_cache_version = version
+
+# Helper function to serve a read from the warm cache, calling loader() on a miss
+# Handlers making several cached reads call sync_catalog_cache() once and pass synced=True
+def cached_read(cache_key, loader, synced=False):
+    if not synced:
+        sync_catalog_cache()
+    now = time.time()
+    entry = catalog_cache.get(cache_key)
+    if entry and now - entry[0] < CACHE_TTL_SECONDS:
+        catalog_cache.move_to_end(cache_key)
+        return entry[1]
+    value = loader()
+    catalog_cache[cache_key] = (now, value)
+    catalog_cache.move_to_end(cache_key)
+    while len(catalog_cache) > CACHE_MAX_ENTRIES:
+        catalog_cache.popitem(last=False)
+    return value
+
+# Helper function to run one page of a scan/query and return (items, next_cursor)
+def fetch_page(operation, limit, start_key, **kwargs):
+    kwargs["Limit"] = limit
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    response = operation(**kwargs)
+    return response.get("Items", []), encode_cursor(response.get("LastEvaluatedKey"))
+
+# Helper function to fetch one page of quotes for a year from the YearIndex GSI
+def query_quotes_by_year(year, params):
+    limit = parse_limit(params)
+    start_key = decode_cursor(params.get("cursor"))
+    fields = parse_fields(params)
+    return cached_read(
+        ("year", year, limit, params.get("cursor"), fields),
+        lambda: fetch_page(
+            table.query,
+            limit,
+            start_key,
+            IndexName=YEAR_INDEX,
+            KeyConditionExpression=Key("year").eq(year),
+            **projection_kwargs(fields)
+        )
+    )
+
+# Helper function to write the category and keyword index rows for a quote
+def put_index_rows(item):
+    with category_table.batch_writer() as batch:
+        for membership in category_memberships(item):
+            batch.put_item(Item=membership)
+    with term_table.batch_writer() as batch:
+        for posting in term_postings(item):
+            batch.put_item(Item=posting)
+
+# Helper function to read a term's full posting list as {quote_id: tf}
+def get_postings(term):
+    postings = {}
+    query_kwargs = {"KeyConditionExpression": Key("term").eq(term)}
+    while True:
+        response = term_table.query(**query_kwargs)
+        for posting in response.get("Items", []):
+            postings[posting["quote_id"]] = int(posting.get("tf", 1))
+        if "LastEvaluatedKey" not in response:
+            return postings
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Helper function to rank quote_ids for a set of terms (mode "and" or "or")
+# Score is the sum of tf-weighted inverse posting-list lengths, so rarer terms count for more
+def rank_quote_ids(terms, mode):
+    scores = {}
+    matched = {}
+    for term in terms:
+        postings = get_postings(term)
+        if not postings and mode == "and":
+            return []
+        weight = 1.0 / (1.0 + math.log(len(postings))) if postings else 0.0
+        for quote_id, tf in postings.items():
+            scores[quote_id] = scores.get(quote_id, 0.0) + weight * (1.0 + math.log(tf))
+            matched[quote_id] = matched.get(quote_id, 0) + 1
+    if mode == "and":
+        scores = {quote_id: score for quote_id, score in scores.items() if matched[quote_id] == len(terms)}
+    return sorted(scores, key=lambda quote_id: (-scores[quote_id], quote_id))
+
+# BatchGetItem accepts at most 100 keys per call; unprocessed keys are retried with exponential backoff
+BATCH_GET_SIZE = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY = 0.05
+
+# Helper function to fetch quotes for a list of ids with BatchGetItem, keeping the input order
+# (e.g. the FAISS ranking); ids that no longer exist are skipped. Raises if keys are still unprocessed after
+# BATCH_GET_MAX_RETRIES, so a throttled read never looks like deleted quotes (or gets cached as a short page)
+def hydrate_quotes(quote_ids, fields=None):
+    found = {}
+    unique_ids = list(dict.fromkeys(quote_ids))
+    # quote_id is always fetched so results can be put back in order, then trimmed if not requested
+    projection = projection_kwargs(fields if not fields or "quote_id" in fields else ("quote_id",) + fields)
+    for start in range(0, len(unique_ids), BATCH_GET_SIZE):
+        request_items = {
+            table.name: {
+                "Keys": [{"quote_id": quote_id} for quote_id in unique_ids[start:start + BATCH_GET_SIZE]],
+                **projection
+            }
+        }
+        attempt = 0
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table.name, []):
+                found[item["quote_id"]] = item
+            request_items = response.get("UnprocessedKeys")
+            if request_items:
+                if attempt >= BATCH_GET_MAX_RETRIES:
+                    # A ClientError, so the search/category handlers' ClientError paths turn it into a 500 as well
+                    raise ClientError({"Error": {
+                        "Code": "ProvisionedThroughputExceededException",
+                        "Message": f"BatchGetItem left {len(request_items[table.name]['Keys'])} quotes unprocessed after {attempt} retries"
+                    }}, "BatchGetItem")
+                time.sleep(BATCH_GET_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+                attempt += 1
+    return trim_fields([found[quote_id] for quote_id in quote_ids if quote_id in found], fields)
+
+# Function to get all quotes, one page at a time (?limit=&cursor=)
 def get_motivational_quotes(event, context):
+    params = get_query_params(event)
     try:
-        response = table.scan()
-        
-        # Convert Decimal values before returning JSON
-        quotes = convert_decimal(response.get("Items", []))
+        limit = parse_limit(params)
+        start_key = decode_cursor(params.get("cursor"))
+        fields = parse_fields(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
+
+    try:
+        quotes, next_cursor = cached_read(
+            ("quotes", limit, params.get("cursor"), fields),
+            lambda: fetch_page(table.scan, limit, start_key, **projection_kwargs(fields))
+        )
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": quotes})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
         }
 
     except ClientError as e:
@@ -50,18 +387,17 @@ def get_motivational_quotes_by_year(event, context):
     year = int(event["pathParameters"]["year"])  # Ensure it's an integer
 
     try:
-        response = table.scan(
-            FilterExpression="#yr = :year",
-            ExpressionAttributeNames={"#yr": "year"},
-            ExpressionAttributeValues={":year": year}  
-        )
-        
-        # Convert Decimal values before returning JSON
-        quotes = convert_decimal(response.get("Items", []))
+        quotes, next_cursor = query_quotes_by_year(year, get_query_params(event))
         
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": quotes})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
+        }
+
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
         }
 
     except ClientError as e:
@@ -89,7 +425,6 @@ def generate_quote_explanation(event, context):
                 "statusCode": 404,
                 "body": json.dumps({"error": "Quote not found"})
             }
-        quote_item = convert_decimal(quote_item)
 
         # Create a prompt using the quote_text field (make sure your DynamoDB items use the field name "quote_text")
         prompt = f"Explain this motivational quote in simple terms: \"{quote_item['quote_text']}\""
@@ -122,9 +457,12 @@ def generate_quote_explanation(event, context):
             "body": json.dumps({"error": str(e)})
         }
     
-# Function to search quotes by keyword
+# Function to search quotes by keyword via the QuoteTerms inverted index
+# ?mode=and (default) requires every term, ?mode=or matches any; results are ranked by relevance
 def search_quotes(event, context):
-    keyword = event["queryStringParameters"].get("keyword", "").lower()
+    params = event["queryStringParameters"]
+    keyword = params.get("keyword", "")
+    mode = params.get("mode", "and")
 
     if not keyword:
         return {
@@ -132,18 +470,36 @@ def search_quotes(event, context):
             "body": json.dumps({"error": "Keyword query parameter is required."})
         }
 
+    if mode not in ("and", "or"):
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": "mode must be 'and' or 'or'."})
+        }
+
     try:
-        response = table.scan()
-        all_quotes = response.get("Items", [])
+        limit = parse_limit(params)
+        offset = (decode_cursor(params.get("cursor")) or {}).get("offset", 0)
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("cursor is invalid")
+        fields = parse_fields(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
 
-        # Filter quotes that contain the keyword in text
-        filtered_quotes = [
-            quote for quote in all_quotes if keyword in quote.get("quote_text", "").lower()
-        ]
+    try:
+        terms = tuple(dict.fromkeys(tokenize(keyword)))
+        sync_catalog_cache()
+        ranked_ids = cached_read(("search", terms, mode), lambda: rank_quote_ids(terms, mode) if terms else [], synced=True)
+        page_ids = ranked_ids[offset:offset + limit]
+        next_offset = offset + limit
+        next_cursor = encode_cursor({"offset": next_offset}) if next_offset < len(ranked_ids) else None
+        quotes = cached_read(("hydrate", tuple(page_ids), fields), lambda: hydrate_quotes(page_ids, fields), synced=True)
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": convert_decimal(filtered_quotes)})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
         }
 
     except ClientError as e:
@@ -152,26 +508,51 @@ def search_quotes(event, context):
             "body": json.dumps({"error": e.response["Error"]["Message"]})
         }
 
-# Function to filter quotes by category
+# Function to filter quotes by category via the QuoteCategories membership table
 def filter_quotes_by_category(event, context):
-    category = event["queryStringParameters"].get("category", "").lower()
+    params = event["queryStringParameters"]
+    categories = normalize_categories(params.get("category", ""))
 
-    if not category:
+    if not categories:
         return {
             "statusCode": 400,
             "body": json.dumps({"error": "Category query parameter is required."})
         }
+    # One membership partition per page, so the cursor stays a single LastEvaluatedKey
+    if len(categories) > 1:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": "Only one category can be filtered at a time."})
+        }
 
     try:
-        response = table.scan(
-            FilterExpression="contains(#cat, :category)",
-            ExpressionAttributeNames={"#cat": "category"},
-            ExpressionAttributeValues={":category": category}
+        limit = parse_limit(params)
+        start_key = decode_cursor(params.get("cursor"))
+        fields = parse_fields(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
+
+    try:
+        def load_category_page():
+            memberships, next_cursor = fetch_page(
+                category_table.query,
+                limit,
+                start_key,
+                KeyConditionExpression=Key("category").eq(categories[0])
+            )
+            return hydrate_quotes([membership["quote_id"] for membership in memberships], fields), next_cursor
+
+        quotes, next_cursor = cached_read(
+            ("category", categories[0], limit, params.get("cursor"), fields),
+            load_category_page
         )
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": convert_decimal(response.get("Items", []))})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
         }
 
     except ClientError as e:
@@ -180,8 +561,12 @@ def filter_quotes_by_category(event, context):
             "body": json.dumps({"error": e.response["Error"]["Message"]})
         }
     
+# Function to look up quotes by author via the AuthorIndex GSI
+# ?match=prefix (default) uses begins_with on the normalized name, ?match=exact requires a full match
 def filter_quotes_by_author(event, context):
-    author = event["queryStringParameters"].get("author", "").lower()
+    params = event["queryStringParameters"]
+    author = normalize_author(params.get("author", ""))
+    match = params.get("match", "prefix")
 
     if not author:
         return {
@@ -189,16 +574,43 @@ def filter_quotes_by_author(event, context):
             "body": json.dumps({"error": "Author query parameter is required."})
         }
 
+    if match not in ("exact", "prefix"):
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": "match must be 'exact' or 'prefix'."})
+        }
+
+    try:
+        limit = parse_limit(params)
+        start_key = decode_cursor(params.get("cursor"))
+        fields = parse_fields(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
+
     try:
-        response = table.scan(
-            FilterExpression="contains(#auth, :author)",
-            ExpressionAttributeNames={"#auth": "author"},
-            ExpressionAttributeValues={":author": author}
+        key_condition = Key("author_initial").eq(author[0])
+        if match == "exact":
+            key_condition = key_condition & Key("author_lc").eq(author)
+        else:
+            key_condition = key_condition & Key("author_lc").begins_with(author)
+        quotes, next_cursor = cached_read(
+            ("author", author, match, limit, params.get("cursor"), fields),
+            lambda: fetch_page(
+                table.query,
+                limit,
+                start_key,
+                IndexName=AUTHOR_INDEX,
+                KeyConditionExpression=key_condition,
+                **projection_kwargs(fields)
+            )
         )
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": convert_decimal(response.get("Items", []))})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
         }
 
     except ClientError as e:
@@ -220,15 +632,17 @@ def filter_quotes_by_year(event, context):
     year = int(year)
 
     try:
-        response = table.scan(
-            FilterExpression="#yr = :year",
-            ExpressionAttributeNames={"#yr": "year"},
-            ExpressionAttributeValues={":year": year}
-        )
+        quotes, next_cursor = query_quotes_by_year(year, event["queryStringParameters"])
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": convert_decimal(response.get("Items", []))})
+            "body": decimal_json.dumps({"quotes": quotes, "next_cursor": next_cursor})
+        }
+
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
         }
 
     except ClientError as e:
@@ -243,6 +657,13 @@ def get_user_id(event):
     except Exception:
         return None
 
+# Helper function to decide whether POST /quotes should defer embedding (ASYNC_INGESTION, ?async= or "async" in the body)
+def is_async_ingestion(event, body):
+    requested = get_query_params(event).get("async", body.get("async"))
+    if requested is None:
+        return os.getenv("ASYNC_INGESTION", "false").lower() == "true"
+    return str(requested).lower() == "true"
+
 def add_quote(event, context):
     user_id = get_user_id(event)
     try:
@@ -258,6 +679,11 @@ def add_quote(event, context):
                 "statusCode": 400,
                 "body": json.dumps({"error": "quote_text, author, and year are required"})
             }
+        if not isinstance(quote_text, str) or not quote_text.strip():
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": "quote_text must be a non-blank string"})
+            }
         # Generate a unique quote_id
         quote_id = str(uuid.uuid4())
         # Store in DynamoDB
@@ -271,17 +697,24 @@ def add_quote(event, context):
             item["category"] = category
         if image_url:
             item["image_url"] = image_url
+        add_author_fields(item)
+        async_mode = is_async_ingestion(event, body)
+        if async_mode:
+            item["embedding_status"] = "pending"
         table.put_item(Item=item)
+        put_index_rows(item)
+        bump_catalog_version(meta_table)
+        if async_mode:
+            # Embedding and FAISS insert happen later in process_embedding_jobs
+            get_embedding_queue().send([{"quote_id": quote_id, "quote_text": quote_text}])
+            return {
+                "statusCode": 202,
+                "body": json.dumps({"quote_id": quote_id, "embedding_status": "pending", "message": "Quote accepted"})
+            }
         # Generate embedding using OpenAI
-        embedding_response = client.embeddings.create(
-            input=quote_text,
-            model="text-embedding-3-small"
-        )
-        embedding = embedding_response.data[0].embedding
+        embedding = embed_texts([quote_text])[0]
         # Send embedding to FAISS microservice
-        faiss_url = os.getenv("FAISS_SERVICE_URL", "http://localhost:5000/add_embedding")
-        faiss_payload = {"quote_id": quote_id, "embedding": embedding}
-        faiss_resp = requests.post(faiss_url, json=faiss_payload)
+        faiss_resp = post_embedding("/add_embedding", embedding, {"quote_id": quote_id})
         if faiss_resp.status_code != 200:
             return {
                 "statusCode": 500,
@@ -299,6 +732,13 @@ def add_quote(event, context):
 
 def semantic_search(event, context):
     user_id = get_user_id(event)
+    try:
+        fields = parse_fields(get_query_params(event))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
     try:
         body = json.loads(event["body"])
         query = body.get("query")
@@ -309,31 +749,20 @@ def semantic_search(event, context):
                 "body": json.dumps({"error": "query is required"})
             }
         # Generate embedding for the query
-        embedding_response = client.embeddings.create(
-            input=query,
-            model="text-embedding-3-small"
-        )
-        embedding = embedding_response.data[0].embedding
+        embedding = embed_texts([query])[0]
         # Send embedding to FAISS microservice for search
-        faiss_url = os.getenv("FAISS_SERVICE_URL", "http://localhost:5000/search")
-        faiss_payload = {"embedding": embedding, "top_k": top_k}
-        faiss_resp = requests.post(faiss_url, json=faiss_payload)
+        faiss_resp = post_embedding("/search", embedding, {"top_k": top_k})
         if faiss_resp.status_code != 200:
             return {
                 "statusCode": 500,
                 "body": json.dumps({"error": "Failed to search FAISS service"})
             }
-        result_ids = faiss_resp.json().get("results", [])
-        # Fetch quotes from DynamoDB
-        quotes = []
-        for quote_id in result_ids:
-            resp = table.get_item(Key={"quote_id": quote_id})
-            item = resp.get("Item")
-            if item:
-                quotes.append(convert_decimal(item))
+        result_ids = search_result_ids(faiss_resp.json())
+        # Fetch quotes from DynamoDB in FAISS ranking order
+        quotes = hydrate_quotes(result_ids, fields)
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": quotes})
+            "body": decimal_json.dumps({"quotes": quotes})
         }
     except Exception as e:
         return {
@@ -343,6 +772,13 @@ def semantic_search(event, context):
 
 def personalized_recommendations(event, context):
     user_id = get_user_id(event)
+    try:
+        fields = parse_fields(get_query_params(event))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": str(e)})
+        }
     try:
         body = json.loads(event["body"])
         # Accept either a 'profile' string or a 'history' list of strings
@@ -359,31 +795,20 @@ def personalized_recommendations(event, context):
                 "body": json.dumps({"error": "profile (string) or history (list of strings) is required"})
             }
         # Generate embedding for the user
-        embedding_response = client.embeddings.create(
-            input=user_text,
-            model="text-embedding-3-small"
-        )
-        embedding = embedding_response.data[0].embedding
+        embedding = embed_texts([user_text])[0]
         # Send embedding to FAISS microservice for search
-        faiss_url = os.getenv("FAISS_SERVICE_URL", "http://localhost:5000/search")
-        faiss_payload = {"embedding": embedding, "top_k": top_k}
-        faiss_resp = requests.post(faiss_url, json=faiss_payload)
+        faiss_resp = post_embedding("/search", embedding, {"top_k": top_k})
         if faiss_resp.status_code != 200:
             return {
                 "statusCode": 500,
                 "body": json.dumps({"error": "Failed to search FAISS service"})
             }
-        result_ids = faiss_resp.json().get("results", [])
-        # Fetch quotes from DynamoDB
-        quotes = []
-        for quote_id in result_ids:
-            resp = table.get_item(Key={"quote_id": quote_id})
-            item = resp.get("Item")
-            if item:
-                quotes.append(convert_decimal(item))
+        result_ids = search_result_ids(faiss_resp.json())
+        # Fetch quotes from DynamoDB in FAISS ranking order
+        quotes = hydrate_quotes(result_ids, fields)
         return {
             "statusCode": 200,
-            "body": json.dumps({"quotes": quotes})
+            "body": decimal_json.dumps({"quotes": quotes})
         }
     except Exception as e:
         return {
@@ -403,6 +828,7 @@ def batch_upload_quotes(event, context):
             }
         successes = []
         failures = []
+        items = []
         for quote in quotes:
             try:
                 quote_text = quote.get("quote_text")
@@ -412,6 +838,8 @@ def batch_upload_quotes(event, context):
                 image_url = quote.get("image_url")
                 if not quote_text or not author or not year:
                     raise ValueError("quote_text, author, and year are required")
+                if not isinstance(quote_text, str) or not quote_text.strip():
+                    raise ValueError("quote_text must be a non-blank string")
                 quote_id = str(uuid.uuid4())
                 item = {
                     "quote_id": quote_id,
@@ -423,23 +851,90 @@ def batch_upload_quotes(event, context):
                     item["category"] = category
                 if image_url:
                     item["image_url"] = image_url
-                table.put_item(Item=item)
-                embedding_response = client.embeddings.create(
-                    input=quote_text,
-                    model="text-embedding-3-small"
-                )
-                embedding = embedding_response.data[0].embedding
-                faiss_url = os.getenv("FAISS_SERVICE_URL", "http://localhost:5000/add_embedding")
-                faiss_payload = {"quote_id": quote_id, "embedding": embedding}
-                faiss_resp = requests.post(faiss_url, json=faiss_payload)
-                if faiss_resp.status_code != 200:
-                    raise Exception("Failed to add embedding to FAISS service")
-                successes.append(quote_id)
+                add_author_fields(item)
+                items.append((quote, item))
             except Exception as e:
                 failures.append({"quote": quote, "error": str(e)})
+        # Run DynamoDB writes, embedding calls and FAISS inserts as overlapping pipeline stages
+        outcome_lock = threading.Lock()
+        stored_count = [0]
+        reported = set()
+
+        def record_failures(batch, error):
+            with outcome_lock:
+                failures.extend({"quote": quote, "error": error} for quote, _ in batch)
+                reported.update(item["quote_id"] for _, item in batch)
+
+        # Unexpected stage errors: the FAISS stage carries (entry, embedding) pairs, the others plain entries
+        def stage_failed(position, batch, error):
+            record_failures([entry for entry, _ in batch] if position == 2 else batch, error)
+
+        def write_stage(batch):
+            try:
+                with borrow_tables(table.name, category_table.name, term_table.name) as tables:
+                    results = write_quotes([item for _, item in batch], *tables)
+            except Exception as e:
+                record_failures(batch, str(e))
+                return None
+            stored = []
+            for entry, (_, error) in zip(batch, results):
+                if error:
+                    record_failures([entry], error)
+                else:
+                    stored.append(entry)
+            with outcome_lock:
+                stored_count[0] += len(stored)
+            return stored
+
+        def embed_stage(batch):
+            embedded = []
+            for entry, (embedding, error) in zip(batch, embed_chunk([item["quote_text"] for _, item in batch])):
+                if error:
+                    record_failures([entry], error)
+                else:
+                    embedded.append((entry, embedding))
+            return embedded
+
+        def faiss_stage(embedded):
+            batch = [entry for entry, _ in embedded]
+            # Add the whole chunk to FAISS in one request
+            try:
+                faiss_resp = post_embeddings([item["quote_id"] for _, item in batch], [embedding for _, embedding in embedded])
+                if faiss_resp.status_code != 200:
+                    raise Exception("Failed to add embeddings to FAISS service")
+                with outcome_lock:
+                    successes.extend(item["quote_id"] for _, item in batch)
+            except Exception as e:
+                record_failures(batch, str(e))
+
+        started = time.time()
+        try:
+            run_pipeline(
+                embedding_batches(items, lambda entry: entry[1]["quote_text"]),
+                [
+                    (write_stage, INGEST_WRITE_WORKERS),
+                    (embed_stage, INGEST_EMBED_WORKERS),
+                    (faiss_stage, INGEST_FAISS_WORKERS)
+                ],
+                stage_failed
+            )
+        except Exception as e:
+            # Chunks that already went through are still reported as successes so a retry does not duplicate them
+            done = reported.union(successes)
+            record_failures([entry for entry in items if entry[1]["quote_id"] not in done], str(e))
+        elapsed = time.time() - started
+        if stored_count[0]:
+            bump_catalog_version(meta_table)
+        stats = {
+            "embedding_cache": embedding_cache.stats(),
+            "quotes": len(quotes),
+            "succeeded": len(successes),
+            "seconds": round(elapsed, 3),
+            "quotes_per_second": round(len(successes) / elapsed, 2) if elapsed > 0 else None
+        }
         return {
             "statusCode": 200,
-            "body": json.dumps({"successes": successes, "failures": failures})
+            "body": json.dumps({"successes": successes, "failures": failures, "stats": stats})
         }
     except Exception as e:
         return {
@@ -447,6 +942,92 @@ def batch_upload_quotes(event, context):
             "body": json.dumps({"error": str(e)})
         }
 
+# Function to report this container's embedding cache hit/miss counters
+def get_embedding_cache_stats(event, context):
+    return {"statusCode": 200, "body": json.dumps(embedding_cache.stats())}
+
+# Number of queued embedding jobs the worker takes per receive
+EMBEDDING_WORKER_BATCH = int(os.getenv("EMBEDDING_WORKER_BATCH", "50"))
+
+# Helper function to set a quote's embedding_status, logging (not raising) on failure
+def set_embedding_status(quote_id, status):
+    try:
+        table.update_item(
+            Key={"quote_id": quote_id},
+            UpdateExpression="SET embedding_status = :status",
+            ExpressionAttributeValues={":status": status}
+        )
+    except ClientError as e:
+        print(f"Failed to mark {quote_id} {status}: {e.response['Error']['Message']}")
+
+# Helper function to embed and index queued jobs [(receipt, job)], returning the receipts that failed
+def index_embedding_jobs(entries):
+    # SQS can redeliver a batch whose vectors were already added, so quotes already marked ready are skipped
+    try:
+        statuses = {
+            quote["quote_id"]: quote.get("embedding_status")
+            for quote in hydrate_quotes([job["quote_id"] for _, job in entries], ("quote_id", "embedding_status"))
+        }
+    except Exception as e:
+        print(f"Embedding status lookup failed: {e}")
+        return [receipt for receipt, _ in entries]
+    pending = []
+    for receipt, job in entries:
+        if statuses.get(job["quote_id"]) == "ready":
+            continue
+        quote_text = job.get("quote_text")
+        if not isinstance(quote_text, str) or not quote_text.strip():
+            # A retry cannot fix the text, so record the failure and let the message go
+            set_embedding_status(job["quote_id"], "failed")
+            continue
+        pending.append((receipt, job))
+    failed = []
+    for batch in embedding_batches(pending, lambda entry: entry[1]["quote_text"]):
+        # A failed chunk is retried one job at a time, so only the jobs that really fail are redelivered
+        embedded = []
+        for entry, (vector, error) in zip(batch, embed_chunk([job["quote_text"] for _, job in batch])):
+            if error:
+                print(f"Embedding failed for {entry[1]['quote_id']}: {error}")
+                failed.append(entry[0])
+            else:
+                embedded.append((entry, vector))
+        if not embedded:
+            continue
+        try:
+            faiss_resp = post_embeddings([job["quote_id"] for (_, job), _ in embedded], [vector for _, vector in embedded])
+            if faiss_resp.status_code != 200:
+                raise Exception("Failed to add embeddings to FAISS service")
+        except Exception as e:
+            print(f"Embedding batch failed: {e}")
+            failed.extend(receipt for (receipt, _), _ in embedded)
+            continue
+        # The vectors are already indexed, so a failed status update must not put the jobs back on the queue
+        for (_, job), _ in embedded:
+            set_embedding_status(job["quote_id"], "ready")
+    return failed
+
+# Worker function for asynchronous ingestion
+# Invoked by the SQS event source mapping (Records), or directly to drain the local queue stand-in
+def process_embedding_jobs(event, context):
+    if event and event.get("Records"):
+        entries = [(record["messageId"], json.loads(record["body"])) for record in event["Records"]]
+        failed = index_embedding_jobs(entries)
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
+
+    job_queue = get_embedding_queue()
+    processed = 0
+    failed_count = 0
+    while True:
+        messages = job_queue.receive(EMBEDDING_WORKER_BATCH)
+        if not messages:
+            break
+        # Failed jobs are left on the queue and become visible again after the visibility timeout
+        failed = set(index_embedding_jobs(messages))
+        job_queue.delete([receipt for receipt, _ in messages if receipt not in failed])
+        processed += len(messages) - len(failed)
+        failed_count += len(failed)
+    return {"processed": processed, "failed": failed_count}
+
 def favorite_quote(event, context):
     user_id = get_user_id(event)
     quote_id = event["pathParameters"]["id"]
@@ -467,16 +1048,16 @@ def unfavorite_quote(event, context):
 
 def get_favorites(event, context):
     user_id = get_user_id(event)
+    try:
+        fields = parse_fields(get_query_params(event))
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
     try:
         resp = favorites_table.query(KeyConditionExpression=boto3.dynamodb.conditions.Key("user_id").eq(user_id))
         quote_ids = [item["quote_id"] for item in resp.get("Items", [])]
         # Fetch quote details from main table
-        quotes = []
-        for quote_id in quote_ids:
-            q = table.get_item(Key={"quote_id": quote_id}).get("Item")
-            if q:
-                quotes.append(convert_decimal(q))
-        return {"statusCode": 200, "body": json.dumps({"favorites": quotes})}
+        quotes = hydrate_quotes(quote_ids, fields)
+        return {"statusCode": 200, "body": decimal_json.dumps({"favorites": quotes})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
@@ -492,15 +1073,15 @@ def add_to_history(event, context):
 
 def get_history(event, context):
     user_id = get_user_id(event)
+    try:
+        fields = parse_fields(get_query_params(event))
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
     try:
         resp = history_table.query(KeyConditionExpression=boto3.dynamodb.conditions.Key("user_id").eq(user_id), ScanIndexForward=False, Limit=20)
         items = resp.get("Items", [])
-        # Fetch quote details from main table
-        quotes = []
-        for item in items:
-            q = table.get_item(Key={"quote_id": item["quote_id"]}).get("Item")
-            if q:
-                quotes.append(convert_decimal(q))
-        return {"statusCode": 200, "body": json.dumps({"history": quotes})}
+        # Fetch quote details from main table, newest view first
+        quotes = hydrate_quotes([item["quote_id"] for item in items], fields)
+        return {"statusCode": 200, "body": decimal_json.dumps({"history": quotes})}
     except Exception as e:
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
\ No newline at end of file
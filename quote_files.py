@@ -0,0 +1,105 @@
+# Streaming readers for quote files and the loader's resume checkpoint, shared by upload_quotes.py and build_index.py.
+# Kept free of boto3 so the parsers can be used (and tested) without AWS dependencies.
+import gzip
+import json
+import os
+import re
+from decimal import Decimal
+
+# Bytes read per refill; the parser keeps at least this much read ahead of the current element
+READ_SIZE = 1 << 16
+
+# DynamoDB rejects Python floats, so numbers with a fraction are parsed as Decimal
+decoder = json.JSONDecoder(parse_float=Decimal)
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Stream the elements of a top-level JSON array without loading the whole file.
+# Malformed arrays (a missing or trailing comma, no closing bracket) raise ValueError.
+def iter_json_array(file):
+    buffer = file.read(READ_SIZE)
+    pos = WHITESPACE.match(buffer, 0).end()
+    if buffer[pos:pos + 1] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    eof = False
+    # After "[" or "," a value is expected; after a value, "," or "]"
+    expect_value = True
+    empty = True
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        # Keep at least one full read ahead so a quote is never split across the buffer end
+        if not eof and len(buffer) - pos < READ_SIZE:
+            data = file.read(READ_SIZE)
+            eof = not data
+            buffer = buffer[pos:] + data
+            pos = WHITESPACE.match(buffer, 0).end()
+        char = buffer[pos:pos + 1]
+        if not char:
+            raise ValueError("unterminated JSON array")
+        if not expect_value:
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"expected ',' or ']' after array element, found {char!r}")
+            pos += 1
+            expect_value = True
+            continue
+        if char == "]":
+            if empty:
+                return
+            raise ValueError("trailing comma in JSON array")
+        try:
+            quote, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # A single element larger than the read-ahead: grow the buffer and retry
+            data = file.read(READ_SIZE)
+            eof = not data
+            buffer += data
+            continue
+        expect_value = False
+        empty = False
+        yield quote
+
+# Stream quotes from an NDJSON file (one JSON object per line)
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield decoder.decode(line)
+
+# Stream quotes from a JSON array or NDJSON file (optionally gzipped), picking the format from the first character
+def iter_quotes(filename):
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, 'rt', encoding='utf-8') as file:
+        head = file.read(READ_SIZE)
+        file.seek(0)
+        if head.lstrip().startswith("["):
+            yield from iter_json_array(file)
+        else:
+            yield from iter_ndjson(file)
+
+# Helper functions for the resume checkpoint: how many leading quotes of a source are done
+def read_checkpoint(path, source):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, 'r', encoding='utf-8') as file:
+        checkpoint = json.load(file)
+    if checkpoint.get("source") != source:
+        raise ValueError(f"checkpoint {path} belongs to {checkpoint.get('source')}, not {source}")
+    return checkpoint["done"]
+
+def write_checkpoint(path, source, done):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({"source": source, "done": done}, file)
+    os.replace(temp_path, path)
+
+# Helper function to skip the quotes a checkpoint marks as done; returns (remaining quotes, done)
+def resume_quotes(quotes, checkpoint_path, source):
+    done = read_checkpoint(checkpoint_path, source)
+    quotes = iter(quotes)
+    for _ in range(done):
+        if next(quotes, None) is None:
+            break
+    return quotes, done
@@ -0,0 +1,177 @@
+# Write-time index attributes and bulk write helpers shared by handler.py and upload_quotes.py.
+# Kept free of OpenAI/requests imports so the bulk loader can use it on its own.
+import boto3 # type: ignore
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+
+AUTHOR_INDEX = "AuthorIndex"
+
+# Helper function to normalize an author name for case-insensitive lookups
+def normalize_author(author):
+    return " ".join(str(author).split()).lower()
+
+# Helper function to add the AuthorIndex attributes to a quote item (in place)
+# author_initial is the GSI partition key so that begins_with can run on the author_lc sort key
+def add_author_fields(item):
+    author_lc = normalize_author(item.get("author", ""))
+    if author_lc:
+        item["author_lc"] = author_lc
+        item["author_initial"] = author_lc[0]
+    return item
+
+# Helper function to normalize a free-form category value into a list of unique lowercase names
+# Accepts a single string (comma separated for multiple categories) or a list of strings
+def normalize_categories(category):
+    if not category:
+        return []
+    values = category.split(",") if isinstance(category, str) else category
+    categories = []
+    for value in values:
+        name = " ".join(str(value).split()).lower()
+        if name and name not in categories:
+            categories.append(name)
+    return categories
+
+# Helper function to build the QuoteCategories membership rows for a quote item
+def category_memberships(item):
+    return [
+        {"category": category, "quote_id": item["quote_id"]}
+        for category in normalize_categories(item.get("category"))
+    ]
+
+# Words too common to be worth a posting list
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "if", "in", "is",
+    "it", "of", "on", "or", "so", "that", "the", "to", "was", "we", "what", "with", "you"
+}
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Helper function to split text into lowercase index terms, dropping stopwords
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+# Helper function to build the QuoteTerms posting rows (term -> quote_id with term frequency) for a quote item
+def term_postings(item):
+    counts = Counter(tokenize(item.get("quote_text", "")))
+    return [
+        {"term": term, "quote_id": item["quote_id"], "tf": tf}
+        for term, tf in counts.items()
+    ]
+
+# CatalogMeta row whose version counter invalidates the per-container read caches
+CATALOG_VERSION_KEY = "catalog"
+
+# Helper function to bump the catalog version after quotes are written
+def bump_catalog_version(meta_table):
+    meta_table.update_item(
+        Key={"meta_key": CATALOG_VERSION_KEY},
+        UpdateExpression="ADD #v :one",
+        ExpressionAttributeNames={"#v": "version"},
+        ExpressionAttributeValues={":one": 1}
+    )
+
+# Number of quotes written per batch_writer pass; a failed pass is retried one quote at a time
+WRITE_CHUNK_SIZE = 25
+
+# Helper function to write quotes and their index rows through batch_writer (25-item BatchWriteItem
+# calls, unprocessed items retried by the writer)
+def write_quote_chunk(items, quote_table, category_table, term_table):
+    with quote_table.batch_writer(overwrite_by_pkeys=["quote_id"]) as quote_batch, \
+            category_table.batch_writer(overwrite_by_pkeys=["category", "quote_id"]) as category_batch, \
+            term_table.batch_writer(overwrite_by_pkeys=["term", "quote_id"]) as term_batch:
+        for item in items:
+            quote_batch.put_item(Item=item)
+            for membership in category_memberships(item):
+                category_batch.put_item(Item=membership)
+            for posting in term_postings(item):
+                term_batch.put_item(Item=posting)
+
+# Helper function to run write_chunk over WRITE_CHUNK_SIZE slices, returning [(item, error message or None)]
+# in input order
+def write_in_chunks(items, write_chunk):
+    results = []
+    for start in range(0, len(items), WRITE_CHUNK_SIZE):
+        chunk = items[start:start + WRITE_CHUNK_SIZE]
+        try:
+            write_chunk(chunk)
+            results.extend((item, None) for item in chunk)
+        except Exception:
+            # The writer cannot say which item failed, so isolate them
+            for item in chunk:
+                try:
+                    write_chunk([item])
+                    results.append((item, None))
+                except Exception as e:
+                    results.append((item, str(e)))
+    return results
+
+# Function to bulk write quotes, returning [(item, error message or None)] in input order
+def write_quotes(items, quote_table, category_table, term_table):
+    return write_in_chunks(items, lambda chunk: write_quote_chunk(chunk, quote_table, category_table, term_table))
+
+# Helper function to set the AuthorIndex attributes on a stored quote without rewriting the rest of the item.
+# The update only applies while the author is still the one that was read, so a newer edit is never reverted.
+def update_author_fields(quote_table, item):
+    fields = add_author_fields({"author": item.get("author", "")})
+    if "author_lc" not in fields:
+        return
+    if item.get("author_lc") == fields["author_lc"] and item.get("author_initial") == fields["author_initial"]:
+        return
+    try:
+        quote_table.update_item(
+            Key={"quote_id": item["quote_id"]},
+            UpdateExpression="SET author_lc = :author_lc, author_initial = :author_initial",
+            ConditionExpression="author = :author",
+            ExpressionAttributeValues={
+                ":author_lc": fields["author_lc"],
+                ":author_initial": fields["author_initial"],
+                ":author": item["author"]
+            }
+        )
+    except quote_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Deleted or re-authored since the scan; that write set its own index attributes
+        pass
+
+# Helper function to write the category membership and term posting rows for quotes
+def write_index_rows(items, category_table, term_table):
+    with category_table.batch_writer(overwrite_by_pkeys=["category", "quote_id"]) as category_batch, \
+            term_table.batch_writer(overwrite_by_pkeys=["term", "quote_id"]) as term_batch:
+        for item in items:
+            for membership in category_memberships(item):
+                category_batch.put_item(Item=membership)
+            for posting in term_postings(item):
+                term_batch.put_item(Item=posting)
+
+# Function to rebuild the derived data of stored quotes (index rows and AuthorIndex attributes) without
+# putting the quotes themselves, so fields changed since they were read (e.g. embedding_status) are kept.
+# Returns [(item, error message or None)] in input order.
+def reindex_quotes(items, quote_table, category_table, term_table):
+    def reindex_chunk(chunk):
+        write_index_rows(chunk, category_table, term_table)
+        for item in chunk:
+            update_author_fields(quote_table, item)
+    return write_in_chunks(items, reindex_chunk)
+
+# Sets of Table resources for worker threads, one boto3 session per set (resources are not thread safe).
+# Sets are returned to the pool after each use, so short-lived workers reuse them across warm invocations.
+REGION = "us-east-1"
+table_pools = {}
+table_pool_lock = threading.Lock()
+
+# Helper function to borrow a set of tables for the given names for the duration of a with block
+@contextmanager
+def borrow_tables(*table_names):
+    with table_pool_lock:
+        free = table_pools.setdefault(table_names, [])
+        tables = free.pop() if free else None
+    if tables is None:
+        resource = boto3.session.Session().resource("dynamodb", region_name=REGION)
+        tables = tuple(resource.Table(name) for name in table_names)
+    try:
+        yield tables
+    finally:
+        with table_pool_lock:
+            table_pools[table_names].append(tables)
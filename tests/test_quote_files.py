@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import sys
+from decimal import Decimal
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import quote_files
+from quote_files import iter_json_array, iter_quotes, resume_quotes, write_checkpoint
+
+def quotes(count, text="x"):
+    return [{"quote_id": str(number), "quote_text": text * (number % 7 + 1), "year": number} for number in range(count)]
+
+def parse(text):
+    return list(iter_json_array(io.StringIO(text)))
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    monkeypatch.setattr(quote_files, "READ_SIZE", 16)
+
+def test_elements_split_across_reads(small_reads):
+    expected = quotes(50)
+    assert parse(json.dumps(expected)) == expected
+    assert parse(json.dumps(expected, indent=4)) == expected
+
+def test_element_larger_than_read_ahead(small_reads):
+    expected = [{"quote_id": "a"}, {"quote_id": "b", "quote_text": "y" * 1000}, {"quote_id": "c"}]
+    assert parse(json.dumps(expected)) == expected
+
+def test_empty_array_and_whitespace():
+    assert parse(" [ ] ") == []
+    assert parse("\n[\n1 ,\t2\n]\n") == [1, 2]
+
+def test_fractions_parse_as_decimal():
+    assert parse('[{"score": 0.5}]') == [{"score": Decimal("0.5")}]
+
+@pytest.mark.parametrize("text", ["[1 2]", '[{"a": 1} {"b": 2}]', "[1,]", "[1,,2]", "[,1]", "[1", "[1,", "[", "{}"])
+def test_malformed_arrays_raise(text):
+    with pytest.raises(ValueError):
+        parse(text)
+
+@pytest.mark.parametrize("text", ["[1 2]", "[1,]", "[1"])
+def test_malformed_arrays_raise_with_small_reads(small_reads, text):
+    with pytest.raises(ValueError):
+        parse(" " * 20 + text)
+
+def test_iter_quotes_reads_ndjson(tmp_path):
+    path = tmp_path / "quotes.ndjson"
+    path.write_text("\n".join(json.dumps(quote) for quote in quotes(3)) + "\n\n")
+    assert list(iter_quotes(str(path))) == quotes(3)
+
+def test_resume_skips_checkpointed_quotes(tmp_path, small_reads):
+    path = tmp_path / "quotes.json"
+    path.write_text(json.dumps(quotes(20)))
+    checkpoint = str(tmp_path / "quotes.json.checkpoint")
+    write_checkpoint(checkpoint, str(path), 12)
+    remaining, done = resume_quotes(iter_quotes(str(path)), checkpoint, str(path))
+    assert done == 12
+    assert list(remaining) == quotes(20)[12:]
+
+def test_resume_without_checkpoint_starts_over(tmp_path):
+    remaining, done = resume_quotes(quotes(3), str(tmp_path / "missing.checkpoint"), "quotes.json")
+    assert done == 0
+    assert list(remaining) == quotes(3)
+
+def test_checkpoint_for_another_source_is_rejected(tmp_path):
+    checkpoint = str(tmp_path / "quotes.json.checkpoint")
+    write_checkpoint(checkpoint, "other.json", 5)
+    with pytest.raises(ValueError):
+        resume_quotes(quotes(3), checkpoint, "quotes.json")
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import numpy as np
+
+# The FAISS service imports its modules flat, as when run from faiss_service/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "faiss_service"))
+
+from wal import OP_ADD, OP_DELETE, WriteAheadLog, encode_record, list_segments, read_segment, replay, segment_path
+
+DIM = 4
+
+def vector(value):
+    return np.full((1, DIM), value, dtype="float32")
+
+# Replay onto a plain id list / vector list standing in for the snapshot, deleting like the flat index does
+def replay_onto(directory, snapshot_key, snapshot_ids):
+    ids = list(snapshot_ids)
+    vectors = [vector(0)] * len(ids)
+
+    def add_batch(batch_ids, batch_vectors):
+        assert batch_vectors.shape == (len(batch_ids), DIM)
+        ids.extend(batch_ids)
+        vectors.extend(row.reshape(1, DIM) for row in batch_vectors)
+
+    def delete(quote_id):
+        kept = [(stored_id, stored) for stored_id, stored in zip(ids, vectors) if stored_id != quote_id]
+        ids[:] = [stored_id for stored_id, _ in kept]
+        vectors[:] = [stored for _, stored in kept]
+
+    replayed = replay(directory, snapshot_key, DIM, add_batch, delete)
+    return ids, vectors, replayed
+
+def write_log(directory):
+    # Segment 100: a, b (covered by a snapshot taken at 200); segment 200: c, delete a, d
+    log = WriteAheadLog(str(directory), 100)
+    log.sync(log.append([encode_record(OP_ADD, "a", vector(1)), encode_record(OP_ADD, "b", vector(2))]))
+    assert log.rotate(200) == 200
+    log.sync(log.append([encode_record(OP_ADD, "c", vector(3))]))
+    log.sync(log.append([encode_record(OP_DELETE, "a")]))
+    log.sync(log.append([encode_record(OP_ADD, "d", vector(4))]))
+    log.close()
+
+def tear_last_record(directory):
+    path = segment_path(str(directory), list_segments(str(directory))[-1])
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+
+def test_replay_on_snapshot_skips_covered_segments_and_torn_record(tmp_path):
+    write_log(tmp_path)
+    tear_last_record(tmp_path)
+    ids, vectors, replayed = replay_onto(tmp_path, 200, ["a", "b"])
+    assert ids == ["b", "c"]
+    assert vectors[1][0, 0] == 3
+    assert replayed == 2
+
+def test_replay_without_snapshot_applies_every_segment(tmp_path):
+    write_log(tmp_path)
+    ids, vectors, replayed = replay_onto(tmp_path, 0, [])
+    assert ids == ["b", "c", "d"]
+    assert [float(stored[0, 0]) for stored in vectors] == [2.0, 3.0, 4.0]
+    assert replayed == 5
+
+def test_add_then_delete_of_same_id(tmp_path):
+    log = WriteAheadLog(str(tmp_path), 1)
+    log.sync(log.append([encode_record(OP_ADD, "x", vector(1)), encode_record(OP_ADD, "y", vector(2))]))
+    log.sync(log.append([encode_record(OP_DELETE, "x")]))
+    log.close()
+    ids, vectors, _ = replay_onto(tmp_path, 0, [])
+    assert ids == ["y"]
+    assert vectors[0][0, 0] == 2
+
+def test_corrupt_record_ends_segment(tmp_path):
+    log = WriteAheadLog(str(tmp_path), 1)
+    log.sync(log.append([encode_record(OP_ADD, "x", vector(1)), encode_record(OP_ADD, "y", vector(2))]))
+    log.close()
+    path = segment_path(str(tmp_path), 1)
+    with open(path, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        file.write(b"\xff")
+    assert [quote_id for _, quote_id, _ in read_segment(path, DIM)] == ["x"]
+
+def test_concurrent_appends_are_all_durable(tmp_path):
+    log = WriteAheadLog(str(tmp_path), 1)
+
+    def writer(number):
+        for item in range(20):
+            log.sync(log.append([encode_record(OP_ADD, f"{number}-{item}", vector(item))]))
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert log.synced == log.written == 160
+    log.close()
+    ids, _, _ = replay_onto(tmp_path, 0, [])
+    assert sorted(ids) == sorted(f"{number}-{item}" for number in range(8) for item in range(20))
+
+def test_truncate_before_drops_covered_segments(tmp_path):
+    write_log(tmp_path)
+    log = WriteAheadLog(str(tmp_path), 300)
+    log.truncate_before(200)
+    assert list_segments(str(tmp_path)) == [200, 300]
+    log.close()
@@ -1,26 +1,134 @@
 import boto3 # type: ignore
 import json
-from botocore.exceptions import ClientError # type: ignore
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from tqdm import tqdm
+from quote_index import add_author_fields, write_quotes, reindex_quotes, bump_catalog_version, borrow_tables
+from catalog_scan import parallel_scan
+from quote_files import iter_quotes, resume_quotes, write_checkpoint
+import decimal_json
 
 # Initialize DynamoDB resource and specify table name
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
 table = dynamodb.Table('MotivationalQuotes')
+category_table = dynamodb.Table('QuoteCategories')
+term_table = dynamodb.Table('QuoteTerms')
+meta_table = dynamodb.Table('CatalogMeta')
+
+# Loader tuning: quotes per worker task, parallel batch_writer workers
+CHUNK_SIZE = 500
+DEFAULT_WORKERS = 4
 
 # Load quotes from a JSON file
 def load_quotes_from_json(filename):
     with open(filename, 'r', encoding='utf-8') as file:
-        return json.load(file) 
+        return json.load(file, parse_float=Decimal)
+
+# Helper function to borrow this loader's tables for a worker task (see quote_index.borrow_tables)
+def worker_tables():
+    return borrow_tables(table.name, category_table.name, term_table.name)
+
+# Worker task: validate a chunk and write it with batch_writer, returning [(quote, error or None)]
+def upload_chunk(chunk):
+    results = []
+    valid = []
+    for quote in chunk:
+        # Ensure each quote has a unique ID (e.g., UUID or auto-increment)
+        if not isinstance(quote, dict) or not quote.get("quote_id"):
+            results.append((quote, "quote_id is required"))
+            continue
+        valid.append(add_author_fields(quote))
+    with worker_tables() as tables:
+        results.extend(write_quotes(valid, *tables))
+    return results
+
+# Worker task for --reindex: rebuild index rows and author attributes for scanned quotes without re-putting them
+def reindex_chunk(chunk):
+    with worker_tables() as tables:
+        return reindex_quotes(chunk, *tables)
 
-# Function to upload quotes to DynamoDB
-def upload_quotes(quotes):
+# Helper function to group a stream of quotes into lists of CHUNK_SIZE
+def chunked(quotes, size):
+    chunk = []
     for quote in quotes:
-        try:
-            # Ensure each quote has a unique ID (e.g., UUID or auto-increment)
-            response = table.put_item(Item=quote)
-            print(f"Uploaded: {quote['quote_id']}")
-        except ClientError as e:
-            print(f"Error uploading quote: {e.response['Error']['Message']}")
+        chunk.append(quote)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Function to upload a stream of quotes through a pool of workers running chunk_task (upload_chunk or reindex_chunk)
+# Progress is checkpointed after every in-order chunk, so a rerun with the same checkpoint skips finished work.
+# Returns (uploaded, failed) counts; failed quotes are appended to failures_path as NDJSON.
+def upload_quotes(quotes, workers=DEFAULT_WORKERS, checkpoint_path=None, source=None, failures_path=None,
+                  chunk_task=upload_chunk):
+    quotes, done = resume_quotes(quotes, checkpoint_path, source)
+    uploaded = 0
+    failed = 0
+    in_flight = deque()
+    failures_file = open(failures_path, 'a', encoding='utf-8') if failures_path else None
+    progress = tqdm(initial=done, unit="quotes", dynamic_ncols=True)
+
+    def finish_oldest():
+        nonlocal done, uploaded, failed
+        size, future = in_flight.popleft()
+        for quote, error in future.result():
+            if error is None:
+                uploaded += 1
+                continue
+            failed += 1
+            if failures_file:
+                failures_file.write(decimal_json.dumps({"quote": quote, "error": error}) + "\n")
+            else:
+                tqdm.write(f"Error uploading quote {quote.get('quote_id') if isinstance(quote, dict) else quote}: {error}")
+        done += size
+        progress.update(size)
+        if checkpoint_path:
+            write_checkpoint(checkpoint_path, source, done)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in chunked(quotes, CHUNK_SIZE):
+                # Bound the number of chunks held in memory
+                if len(in_flight) >= workers * 2:
+                    finish_oldest()
+                in_flight.append((len(chunk), pool.submit(chunk_task, chunk)))
+            while in_flight:
+                finish_oldest()
+    finally:
+        progress.close()
+        if failures_file:
+            failures_file.close()
+    print(f"Uploaded {uploaded} quotes, {failed} failed")
+    # Invalidate the warm Lambda read caches
+    bump_catalog_version(meta_table)
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return uploaded, failed
 
 if __name__ == "__main__":
-    quotes = load_quotes_from_json("quotes.json")
-    upload_quotes(quotes)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Upload quotes to DynamoDB and write their index rows")
+    parser.add_argument("filename", nargs="?", default="quotes.json", help="JSON array or NDJSON file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel batch_writer workers")
+    parser.add_argument("--checkpoint", default=None,
+                        help="progress file used to resume an interrupted upload (default: <filename>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--failures", default=None, help="append failed quotes to this NDJSON file")
+    parser.add_argument("--reindex", action="store_true",
+                        help="rebuild the author/category/keyword indexes from the live table instead of a file")
+    parser.add_argument("--segments", type=int, default=None, help="parallel scan segments for --reindex")
+    args = parser.parse_args()
+    if args.reindex:
+        upload_quotes(parallel_scan(table.name, args.segments), workers=args.workers, failures_path=args.failures,
+                      chunk_task=reindex_chunk)
+    else:
+        source = os.path.abspath(args.filename)
+        checkpoint_path = args.checkpoint or args.filename + ".checkpoint"
+        if args.restart and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        upload_quotes(iter_quotes(args.filename), workers=args.workers, checkpoint_path=checkpoint_path,
+                      source=source, failures_path=args.failures)